@@ -0,0 +1,138 @@
+"""
+Alias method sampler for N-gram probabilities.
+
+Walker's alias method, with Vose's construction: the table is built
+once in O(k) for k N-grams, then each draw costs one random index and
+one random comparison, O(1), independent of k.  Draws are made in
+batches with NumPy, so there is no per-draw Python overhead.
+"""
+
+import numpy as np
+
+# Random number generator from a seed, or an existing generator
+def make_rng(seed=None):
+    """
+    Return a numpy.random.Generator for a seed (None for fresh entropy),
+    or the generator itself if one is given.
+    """
+    if isinstance(seed, np.random.Generator):
+        return seed
+    return np.random.default_rng(seed)
+
+class AliasSampler:
+    """
+    Draw N-grams at random, each with its own probability.
+    """
+
+    # The constructor takes the probabilities, either as a dictionary
+    # { ngram : prob }, as produced by the unsmoothed_* functions,
+    # or as a list of ( ngram, prob ) pairs.
+    def __init__(self, probs, seed=None):
+        """
+        Build the alias table for the N-gram probabilities.
+        """
+        if isinstance(probs, dict):
+            probs = probs.items()
+        keys = []
+        weights = []
+        for ngram, prob in probs:
+            keys.append(ngram)
+            weights.append(prob)
+        if len(keys) == 0:
+            raise ValueError("AliasSampler: no probabilities given")
+        self.keys = keys
+        self.prob, self.alias = alias_table(np.asarray(weights, dtype=float))
+        self.rng = make_rng(seed)
+
+    # Build a sampler from a list of ( ngram, cummulative probability ),
+    # as produced by cummulative_probabilities().
+    @classmethod
+    def from_cummulative(cls, utcps, seed=None):
+        """
+        Recover the probabilities from their running totals.
+        """
+        keys = [ entry[0] for entry in utcps ]
+        cummulative = np.asarray([ entry[1] for entry in utcps ], dtype=float)
+        probs = np.diff(cummulative, prepend=0.0)
+        return cls(zip(keys, probs), seed=seed)
+
+    # Number of N-grams in the table
+    def __len__(self):
+        return len(self.keys)
+
+    # Draw indexes into keys
+    def sample_indexes(self, n):
+        """
+        Draw n indexes into self.keys, as a NumPy array.
+        """
+        k = len(self.keys)
+        i = self.rng.integers(0, k, size=n)
+        u = self.rng.random(size=n)
+        return np.where(u < self.prob[i], i, self.alias[i])
+
+    # Draw N-grams
+    def sample(self, n):
+        """
+        Draw a list of n N-grams.
+        """
+        keys = self.keys
+        return [ keys[i] for i in self.sample_indexes(n) ]
+
+    # Draw one N-gram
+    def choose(self):
+        """
+        Draw a single N-gram.
+        """
+        return self.keys[self.sample_indexes(1)[0]]
+
+# Vose's alias table construction.
+# Returns ( prob, alias ) arrays: to draw, pick a column i uniformly,
+# then keep i with probability prob[i], otherwise take alias[i].
+def alias_table(weights):
+    """
+    Build the alias table for non-negative weights (need not sum to 1).
+    """
+    total = weights.sum()
+    if not total > 0.0:
+        raise ValueError("alias_table: weights must have a positive sum")
+    k = len(weights)
+    scaled = weights * (k / total)
+    prob = np.ones(k)
+    alias = np.arange(k)
+    small = [ int(i) for i in np.flatnonzero(scaled < 1.0) ]
+    large = [ int(i) for i in np.flatnonzero(scaled >= 1.0) ]
+    scaled = scaled.tolist()
+    while small and large:
+        s = small.pop()
+        l = large.pop()
+        prob[s] = scaled[s]
+        alias[s] = l
+        scaled[l] = (scaled[l] + scaled[s]) - 1.0
+        if scaled[l] < 1.0:
+            small.append(l)
+        else:
+            large.append(l)
+    # anything left over is 1.0 up to rounding error
+    return prob, alias
+
+# ------------------------------------------------------------------------
+# Tests ---
+# ------------------------------------------------------------------------
+
+if __name__ == '__main__':
+
+    from nltk import FreqDist
+
+    utps = { ('', '', 'One') : 0.5, ('', '', 'This') : 0.3,
+             ('', '', 'That') : 0.2 }
+    sampler = AliasSampler(utps, seed=1)
+    dist = FreqDist(sampler.sample(100000))
+    for gram, p in utps.items():
+        assert abs(dist.freq(gram) - p) < 0.01, (gram, dist.freq(gram))
+    print(dist.most_common())
+    utcps = [ (('a',), 0.25), (('b',), 0.5), (('c',), 1.0) ]
+    sampler = AliasSampler.from_cummulative(utcps, seed=1)
+    dist = FreqDist(sampler.sample(100000))
+    for gram, p in [ (('a',), 0.25), (('b',), 0.25), (('c',), 0.5) ]:
+        assert abs(dist.freq(gram) - p) < 0.01, (gram, dist.freq(gram))
+    print(dist.most_common())
@@ -0,0 +1,107 @@
+"""
+Beam search for the most probable sentences of a trigram model.
+
+Hypotheses are partial sentences from the start context ( '', '' ),
+scored by their log probability.  Each step extends every hypothesis in
+the beam by its context's continuations, read from a context index that
+lists each context's next words most probable first, so at most
+beam_width continuations per hypothesis are looked at.  The beam_width
+best extensions are kept; a hypothesis ending with '' is a finished
+sentence.  Log probabilities only fall as words are added, so the search
+stops once k sentences are finished and no hypothesis left in the beam
+scores above the k-th best of them.
+"""
+
+import heapq
+from math import log
+
+from nlp_book_trigram_generator import START, END
+
+class BeamDecoder:
+    """
+    Find high probability sentences of trigram probabilities.
+    """
+
+    # The constructor takes trigram probabilities
+    # { ( w1, w2, w3 ) : P(w3 | w1, w2) }, e.g. from
+    # unsmoothed_trigrams_sents() or NgramStore.unsmoothed_trigrams().
+    def __init__(self, utps):
+        """
+        Index the continuations of each context, most probable first,
+        with their log probabilities.
+        """
+        index = {}
+        for trigram, prob in utps.items():
+            if prob > 0.0:
+                index.setdefault(trigram[:2], []).append((log(prob),
+                                                          trigram[2]))
+        for context in index:
+            index[context].sort(key=lambda entry: -entry[0])
+        self.index = index
+
+    # Build a decoder from a list of sentences
+    @classmethod
+    def from_sents(cls, sents):
+        from nlp_book_ngram_store import NgramStore
+        return cls(NgramStore.from_sents(sents).unsmoothed_trigrams())
+
+    # Continuations of a context, most probable first
+    def continuations(self, context):
+        """
+        Return [ ( log probability, word ) ] for a context.
+        """
+        return self.index.get(tuple(context), [])
+
+    # The k most probable sentences
+    def decode(self, k=5, beam_width=50, max_words=50, min_words=1,
+               context=START):
+        """
+        Return up to k ( words, log probability ), most probable first,
+        for sentences of min_words to max_words words that continue
+        context to the end marker.
+        """
+        beam = [ (0.0, tuple(context), ()) ]
+        finished = []       # heap of the k best ( logprob, words )
+        for step in range(max_words + 1):
+            candidates = []
+            for logprob, ctx, words in beam:
+                for next_logprob, word in self.continuations(ctx)[:beam_width]:
+                    total = logprob + next_logprob
+                    if word == END:
+                        if len(words) >= min_words:
+                            if len(finished) < k:
+                                heapq.heappush(finished, (total, words))
+                            elif total > finished[0][0]:
+                                heapq.heapreplace(finished, (total, words))
+                    elif len(words) < max_words:
+                        candidates.append((total, (ctx[1], word), words
+                                           + (word,)))
+            beam = heapq.nlargest(beam_width, candidates,
+                                  key=lambda hyp: hyp[0])
+            if len(beam) == 0:
+                break
+            if len(finished) == k and beam[0][0] <= finished[0][0]:
+                break
+        best = sorted(finished, key=lambda entry: -entry[0])
+        return [ (list(words), logprob) for logprob, words in best ]
+
+# ------------------------------------------------------------------------
+# Tests ---
+# ------------------------------------------------------------------------
+
+if __name__ == '__main__':
+
+    sents = [["One"], ["One", "."], ["One", "two", "."],
+             ['This', 'is', 'a', 'short', 'test', '.'],
+             ['This', 'is', 'a', 'test', '.'] ]
+    decoder = BeamDecoder.from_sents(sents)
+    # every sentence of this corpus has probability 1/5
+    best = decoder.decode(k=4)
+    assert len(best) == 4
+    for words, logprob in best:
+        assert words in sents and abs(logprob - log(0.2)) < 1e-9
+        print(round(logprob, 4), " ".join(words))
+    following = decoder.decode(k=2, context=('This', 'is'))
+    assert sorted([ words for words, logprob in following ]) \
+        == [ ['a', 'short', 'test', '.'], ['a', 'test', '.'] ]
+    print(following)
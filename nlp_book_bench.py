@@ -0,0 +1,246 @@
+"""
+Benchmarks for the N-gram, probability, and sampling hot paths.
+
+Times, and separately measures the peak traced memory of, the N-gram
+extraction, unsmoothed probability, cummulative probability, sampling,
+and Good-Turing functions, on synthetic Zipfian corpora and on
+Gutenberg texts.  Each result is one JSON line:
+
+    {"bench": ..., "corpus": ..., "tokens": ..., "items": ...,
+     "seconds": ..., "items_per_second": ..., "peak_bytes": ...}
+
+so runs can be saved and compared:
+
+    python nlp_book_bench.py --sizes 10000 100000 --out new.jsonl
+    python nlp_book_bench.py --compare old.jsonl new.jsonl
+
+By default all the sizes from 10^4 to 10^7 tokens are run, and every
+Gutenberg text if the corpus is installed; --sizes and --gutenberg
+with fewer or no values give a quicker run.
+"""
+
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+
+# Default synthetic corpus sizes, in tokens
+SIZES = [ 10**4, 10**5, 10**6, 10**7 ]
+
+# Slowdown, as a fraction, reported as a regression by compare()
+THRESHOLD = 0.10
+
+# Synthetic corpus: sentences of words drawn from a Zipf distribution
+def zipf_sents(n_tokens, vocab_size=50000, exponent=1.1,
+               mean_length=20, seed=0):
+    """
+    Return a list of sentences, lists of words 'w<rank>', with about
+    n_tokens words in all.
+    """
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    ranks = rng.zipf(exponent, size=n_tokens)
+    ranks = np.where(ranks > vocab_size, rng.integers(1, vocab_size + 1,
+                                                      size=n_tokens), ranks)
+    words = [ 'w' + str(rank) for rank in ranks.tolist() ]
+    sents = []
+    start = 0
+    while start < n_tokens:
+        length = 1 + int(rng.poisson(mean_length - 1))
+        sents.append(words[start:start + length])
+        start += length
+    return sents
+
+# Run a function once, with its console output discarded
+def run_quiet(function, *args):
+    with open(os.devnull, "w") as devnull:
+        with redirect_stdout(devnull):
+            return function(*args)
+
+# Time a function, best of repeat runs
+def time_it(function, args, repeat):
+    best = None
+    result = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        result = run_quiet(function, *args)
+        seconds = time.perf_counter() - start
+        if best is None or seconds < best:
+            best = seconds
+    return best, result
+
+# Peak memory traced while running a function
+def peak_memory(function, args):
+    tracemalloc.start()
+    try:
+        run_quiet(function, *args)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+# Number of items in a benchmark's result: the N-grams or draws in a
+# list or dictionary, otherwise the tokens processed
+def count_items(result, tokens):
+    if isinstance(result, (list, dict)):
+        return len(result)
+    return tokens
+
+# Benchmarks: ( name, setup ) pairs.  setup(sents) returns
+# ( function, args ) to be timed, with the data it needs prepared.
+def benchmarks(draws=100):
+    from nlp_book_nltk import bi_grams_sents, tri_grams_sents
+    from nlp_book_nltk import unsmoothed_unigrams_sents
+    from nlp_book_nltk import unsmoothed_bigrams_sents
+    from nlp_book_nltk import unsmoothed_trigrams_sents
+    from nlp_book_nltk import count_ngrams_sents, unsmoothed_ngrams_sents
+    from nlp_book_nltk import cummulative_probabilities
+    from nlp_book_nltk import choose_by_probability
+    from nlp_book_nltk import choose_by_probability_bin_search
+
+    def utps_of(sents):
+        return run_quiet(unsmoothed_trigrams_sents, sents)
+
+    def draw(choose, utcps):
+        return [ choose(utcps) for i in range(draws) ]
+
+    def alias_setup(sents):
+        from nlp_book_alias_sampler import AliasSampler
+        sampler = AliasSampler(utps_of(sents), seed=0)
+        return sampler.sample, (draws,)
+
+    def good_turing_setup(sents):
+        from nlp_book_good_turing import SimpleGoodTuring
+        n_sents, dists = count_ngrams_sents(sents)
+        return SimpleGoodTuring.from_freq_dist, (dists[2],)
+
+    def store_setup(sents):
+        from nlp_book_ngram_store import NgramStore
+        return NgramStore.from_sents, (sents,)
+
+    return [
+        ('bi_grams_sents', lambda sents: (bi_grams_sents, (sents,))),
+        ('tri_grams_sents', lambda sents: (tri_grams_sents, (sents,))),
+        ('unsmoothed_unigrams_sents',
+         lambda sents: (unsmoothed_unigrams_sents, (sents,))),
+        ('unsmoothed_bigrams_sents',
+         lambda sents: (unsmoothed_bigrams_sents, (sents,))),
+        ('unsmoothed_trigrams_sents',
+         lambda sents: (unsmoothed_trigrams_sents, (sents,))),
+        ('unsmoothed_ngrams_sents',
+         lambda sents: (unsmoothed_ngrams_sents, (sents,))),
+        ('NgramStore.from_sents', store_setup),
+        ('cummulative_probabilities',
+         lambda sents: (cummulative_probabilities, (utps_of(sents),))),
+        ('choose_by_probability',
+         lambda sents: (draw, (choose_by_probability,
+                               cummulative_probabilities(utps_of(sents))))),
+        ('choose_by_probability_bin_search',
+         lambda sents: (draw, (choose_by_probability_bin_search,
+                               cummulative_probabilities(utps_of(sents))))),
+        ('AliasSampler.sample', alias_setup),
+        ('SimpleGoodTuring', good_turing_setup),
+        ]
+
+# Run the benchmarks on one corpus
+def bench_corpus(label, sents, names=None, repeat=3, memory=True,
+                 out=sys.stdout):
+    """
+    Run the benchmarks on a list of sentences, writing one JSON line
+    per benchmark to out.  Returns the result records.
+    """
+    tokens = sum([ len(sent) for sent in sents ])
+    records = []
+    for name, setup in benchmarks():
+        if names and name not in names:
+            continue
+        function, args = setup(sents)
+        seconds, result = time_it(function, args, repeat)
+        items = count_items(result, tokens)
+        record = { 'bench' : name, 'corpus' : label, 'tokens' : tokens,
+                   'items' : items, 'seconds' : seconds,
+                   'items_per_second' : items / seconds if seconds else None,
+                   'peak_bytes' : peak_memory(function, args)
+                                  if memory else None }
+        out.write(json.dumps(record) + "\n")
+        out.flush()
+        records.append(record)
+    return records
+
+# Read benchmark results from a JSON lines file
+def read_results(filename):
+    with open(filename) as inFile:
+        return [ json.loads(line) for line in inFile if line.strip() ]
+
+# Compare two runs, reporting benchmarks that got slower
+def compare(old_filename, new_filename, threshold=THRESHOLD):
+    """
+    Print the time ratio new/old for each benchmark and corpus in
+    both runs; return the records slower by more than threshold.
+    """
+    old = { (r['bench'], r['corpus']) : r for r in read_results(old_filename) }
+    regressions = []
+    for record in read_results(new_filename):
+        key = (record['bench'], record['corpus'])
+        if key not in old or not old[key]['seconds']:
+            continue
+        ratio = record['seconds'] / old[key]['seconds']
+        flag = ""
+        if ratio > 1.0 + threshold:
+            flag = "  REGRESSION"
+            regressions.append(record)
+        print("%-34s %-24s %8.3f%s" % (key[0], key[1], ratio, flag))
+    return regressions
+
+# Gutenberg fileids, or none if the corpus is not installed
+def gutenberg_fileids():
+    from nltk.corpus import gutenberg
+    try:
+        return gutenberg.fileids()
+    except LookupError:
+        return []
+
+# Command line
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(
+        description="Benchmark the N-gram hot paths.")
+    parser.add_argument('--sizes', type=int, nargs='*', default=SIZES,
+                        help="synthetic Zipfian corpus sizes, in tokens")
+    parser.add_argument('--gutenberg', nargs='*', default=None,
+                        help="Gutenberg fileids to benchmark on "
+                        "(default all, if installed; none if no fileids)")
+    parser.add_argument('--bench', nargs='*', default=None,
+                        help="benchmarks to run (default all)")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-memory', action='store_true',
+                        help="skip the tracemalloc peak memory runs")
+    parser.add_argument('--out', default=None,
+                        help="JSON lines output file (default stdout)")
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'),
+                        help="compare two result files and exit")
+    args = parser.parse_args(argv)
+    if args.compare:
+        regressions = compare(*args.compare)
+        return 1 if regressions else 0
+    if args.gutenberg is None:
+        args.gutenberg = gutenberg_fileids()
+    out = open(args.out, "w") if args.out else sys.stdout
+    try:
+        for size in args.sizes:
+            bench_corpus("zipf-" + str(size), zipf_sents(size), args.bench,
+                         args.repeat, not args.no_memory, out)
+        if args.gutenberg:
+            from nltk.corpus import gutenberg
+            for fileid in args.gutenberg:
+                bench_corpus(fileid, list(gutenberg.sents(fileid)),
+                             args.bench, args.repeat, not args.no_memory, out)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,303 @@
+"""
+Content-addressed on-disk cache for pipeline stage results.
+
+A stage result, e.g. the sentences of a text, its N-gram counts, or a
+Good-Turing fit, is stored under a key hashing
+
+    the content of the input corpus + the stage name + its parameters
+    + the source code computing it
+
+so a changed corpus file, changed parameters, or changed code gives a
+new key and the old result is never returned: there is nothing to
+invalidate by hand.  The code is given as the functions, classes, or
+modules the result depends on (by default the compute function itself),
+and hashed by their source.  Results are pickled, one file per key,
+written atomically.  A hit marks its file as used; when the cache grows
+past max_bytes, the least recently used results are removed, together
+with any temporary files left by interrupted writes.
+
+    cache = StageCache()
+    corpus = file_digest(gutenberg.abspath('austen-emma.txt'))
+    counts = cache.get_or_compute(corpus, 'count_ngrams_sents',
+                                  { 'max_order' : 3 },
+                                  lambda: count_ngrams_sents(sents),
+                                  code=count_ngrams_sents)
+
+The directory is NLP_BOOK_CACHE from the environment, if set, else
+.nlp_book_cache in the working directory.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import tempfile
+import time
+
+# Default cache directory and size limit
+CACHE_DIR = ".nlp_book_cache"
+MAX_BYTES = 2 * 1024 ** 3
+
+# Suffix of cached result files, and of files being written
+SUFFIX = ".pickle"
+TEMP_SUFFIX = ".tmp"
+
+# Age in seconds after which a temporary file is taken to be left over
+# from an interrupted write
+STALE_SECONDS = 3600
+
+# Read files in blocks of this many bytes when hashing them
+BLOCK_SIZE = 1 << 20
+
+# Digests of files already hashed by this process,
+# { path : ( size, mtime_ns, digest ) }
+_file_digests = {}
+
+# Content digest of a file
+def file_digest(filename):
+    """
+    Return the SHA-256 hex digest of a file's content.  Rehashed only
+    if the file's size or modification time changed since the last
+    call in this process.
+    """
+    path = os.path.abspath(str(filename))
+    stat = os.stat(path)
+    known = _file_digests.get(path)
+    if known is not None and known[:2] == (stat.st_size, stat.st_mtime_ns):
+        return known[2]
+    digest = hashlib.sha256()
+    with open(path, "rb") as inFile:
+        for block in iter(lambda: inFile.read(BLOCK_SIZE), b''):
+            digest.update(block)
+    _file_digests[path] = (stat.st_size, stat.st_mtime_ns, digest.hexdigest())
+    return digest.hexdigest()
+
+# Content digest of Python data, e.g. a list of sentences
+def data_digest(data):
+    return hashlib.sha256(pickle.dumps(data, protocol=4)).hexdigest()
+
+# Digest of the code a stage result depends on
+def code_digest(*code):
+    """
+    Return the SHA-256 hex digest of the source of functions, classes,
+    or modules; strings, e.g. a version number, are hashed as they are.
+    Objects without source (built-ins) are hashed by name.
+    """
+    digest = hashlib.sha256()
+    for part in code:
+        if not isinstance(part, str):
+            try:
+                part = inspect.getsource(part)
+            except (OSError, TypeError):
+                part = (getattr(part, '__module__', '') + "."
+                        + getattr(part, '__qualname__', repr(part)))
+        digest.update(part.encode('utf-8'))
+    return digest.hexdigest()
+
+# Cache key for a stage of a corpus
+def stage_key(corpus_digest, stage, params=None, code=None):
+    """
+    Return the hex key for a stage's result: a hash of the corpus
+    digest, the stage name, its parameters as sorted JSON, and the
+    code digest (code_digest()), if given.
+    """
+    text = json.dumps([ corpus_digest, stage, params or {}, code ],
+                      sort_keys=True, default=repr)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+class StageCache:
+    """
+    Pickled stage results on disk, keyed by content, size limited.
+    """
+
+    # The constructor takes the cache directory and its size limit.
+    def __init__(self, directory=None, max_bytes=MAX_BYTES):
+        """
+        Create the cache directory if needed.
+        """
+        if directory is None:
+            directory = os.environ.get('NLP_BOOK_CACHE', CACHE_DIR)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    # File holding a key's result
+    def path(self, key):
+        return os.path.join(self.directory, key + SUFFIX)
+
+    # Cached result for a key
+    def get(self, key, default=None):
+        """
+        Return the result stored under key, or default.  A result that
+        cannot be unpickled, e.g. of a class since renamed or a module
+        since removed, is a miss.
+        """
+        path = self.path(key)
+        try:
+            with open(path, "rb") as inFile:
+                value = pickle.load(inFile)
+        except (OSError, EOFError, pickle.UnpicklingError,
+                AttributeError, ImportError):
+            self.misses += 1
+            return default
+        os.utime(path)      # mark as recently used
+        self.hits += 1
+        return value
+
+    # Store a result
+    def put(self, key, value):
+        """
+        Write a result under key, then evict down to max_bytes.
+        """
+        descriptor, temp_path = tempfile.mkstemp(dir=self.directory,
+                                                 suffix=TEMP_SUFFIX)
+        try:
+            with os.fdopen(descriptor, "wb") as outFile:
+                pickle.dump(value, outFile, protocol=4)
+            os.replace(temp_path, self.path(key))
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        self.evict()
+
+    # Result of a stage, computed only on a miss
+    def get_or_compute(self, corpus_digest, stage, params, compute,
+                       code=None):
+        """
+        Return the cached result of a stage of a corpus, or compute()
+        it and cache it.  code is a function, class, module, or version
+        string, or a tuple of them, the result depends on; by default
+        compute itself.
+        """
+        if code is None:
+            code = compute
+        if not isinstance(code, (tuple, list)):
+            code = (code,)
+        key = stage_key(corpus_digest, stage, params, code_digest(*code))
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    # Cached results and temporary files, least recently used first
+    def entries(self):
+        """
+        Return [ ( last used, bytes, path ) ], least recently used first.
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith((SUFFIX, TEMP_SUFFIX)):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+        entries.sort()
+        return entries
+
+    # Total bytes of cached results and temporary files
+    def size(self):
+        return sum([ entry[1] for entry in self.entries() ])
+
+    # Remove temporary files older than STALE_SECONDS, then least
+    # recently used results until under max_bytes
+    def evict(self):
+        """
+        Return the number of files removed.
+        """
+        entries = self.entries()
+        total = sum([ entry[1] for entry in entries ])
+        removed = 0
+        stale = time.time_ns() - STALE_SECONDS * 10 ** 9
+        for used, size, path in entries:
+            if path.endswith(TEMP_SUFFIX):
+                if used >= stale:
+                    continue        # still being written
+            elif total <= self.max_bytes:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+    # Remove every cached result and temporary file
+    def clear(self):
+        for used, size, path in self.entries():
+            os.remove(path)
+
+# Cache shared by the scripts, created on first use
+_cache = None
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        _cache = StageCache()
+    return _cache
+
+# ------------------------------------------------------------------------
+# Tests ---
+# ------------------------------------------------------------------------
+
+if __name__ == '__main__':
+
+    import time
+    from nlp_book_bench import zipf_sents
+    from nlp_book_nltk import count_ngrams_sents
+
+    directory = tempfile.mkdtemp()
+    cache = StageCache(directory, max_bytes=20 * 1024 ** 2)
+    corpus = os.path.join(directory, "corpus.txt")
+    sents = zipf_sents(200000)
+    with open(corpus, "w") as outFile:
+        outFile.write("\n".join([ " ".join(sent) for sent in sents ]))
+
+    def count():
+        with open(corpus) as inFile:
+            return count_ngrams_sents([ line.split() for line in inFile ])
+
+    for run in range(2):
+        start = time.perf_counter()
+        n_sents, dists = cache.get_or_compute(file_digest(corpus), 'counts',
+                                              { 'max_order' : 3 }, count)
+        print("run", run, time.perf_counter() - start, "seconds,",
+              "hits:", cache.hits, "misses:", cache.misses)
+    assert (cache.hits, cache.misses) == (1, 1)
+    # a changed corpus is a new key
+    with open(corpus, "a") as outFile:
+        outFile.write("\nw1 w2 w3")
+    n_sents_2, dists = cache.get_or_compute(file_digest(corpus), 'counts',
+                                            { 'max_order' : 3 }, count)
+    assert n_sents_2 == n_sents + 1 and cache.misses == 2
+    # changed code is a new key
+    def count_differently():
+        return count()
+    cache.get_or_compute(file_digest(corpus), 'counts', { 'max_order' : 3 },
+                         count_differently)
+    assert cache.misses == 3
+    # a leftover temporary file is counted, and evicted once stale
+    descriptor, temp_path = tempfile.mkstemp(dir=directory,
+                                             suffix=TEMP_SUFFIX)
+    os.write(descriptor, b'x' * 1000)
+    os.close(descriptor)
+    os.utime(temp_path, (0, 0))
+    assert any([ entry[2] == temp_path for entry in cache.entries() ])
+    for i in range(5):
+        cache.put(stage_key('x', 'filler', { 'i' : i }), os.urandom(6 << 20))
+    assert cache.size() <= cache.max_bytes and not os.path.exists(temp_path)
+    # a result that no longer unpickles is a miss
+    with open(cache.path('stale'), "wb") as outFile:
+        outFile.write(b'\x80\x04cnonesuch_module\nThing\n.')
+    assert cache.get('stale', 'missing') == 'missing'
+    print("bytes:", cache.size(), "entries:", len(cache.entries()))
+    cache.clear()
@@ -7,15 +7,80 @@ Sig Nin
 2018 Aug 30
 """
 
-import nltk
+# Tagger, loaded once per process
+_tagger = None
+
+def get_tagger():
+    """
+    Return the NLTK Penn-Treebank perceptron tagger, loading it
+    on the first call.
+    """
+    global _tagger
+    if _tagger is None:
+        from nltk.tag import PerceptronTagger
+        _tagger = PerceptronTagger()
+    return _tagger
+
+def tagged_str(s_pos):
+    """
+    Format a tagged sentence as 'word/TAG word/TAG ... '.
+    """
+    from nltk.tag import tuple2str
+    return "".join([ tuple2str(tuple) + " " for tuple in s_pos ])
 
 def tag_sentence_PT(sentence):
+    import nltk
     s_tokens = nltk.word_tokenize(sentence)
     s_pos = nltk.pos_tag(s_tokens)
-    s_tagged = ""
-    for tagged in [ nltk.tag.tuple2str(tuple) for tuple in s_pos ]:
-        s_tagged += tagged + " "
-    return s_tagged
+    return tagged_str(s_pos)
+
+def tag_sentences_PT(sentences):
+    """
+    Tag a batch of sentences with one tagger, as tag_sentence_PT does.
+    """
+    from nltk import word_tokenize
+    tokens = [ word_tokenize(sentence) for sentence in sentences ]
+    return [ tagged_str(s_pos) for s_pos in get_tagger().tag_sents(tokens) ]
+
+def batches(lines, batch_size):
+    """
+    Generate lists of up to batch_size lines.
+    """
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def tag_sentences_parallel(sentences, batch_size=1000, max_workers=None):
+    """
+    Tag sentences in batches across a process pool, yielding the
+    tagged sentences in input order.  Each worker loads the tagger
+    once; at most two batches per worker are in flight at a time.
+    """
+    from nlp_book_pool import ordered_results
+    tasks = ( (batch,) for batch in batches(sentences, batch_size) )
+    for tagged in ordered_results(tag_sentences_PT, tasks, max_workers):
+        yield from tagged
+
+def tag_file(in_filename, out_filename, batch_size=1000, max_workers=1):
+    """
+    Tag a file of sentences, one per line, writing one tagged sentence
+    per line.  Lines are streamed in batches; with max_workers other
+    than 1 the batches are tagged in a process pool.
+    """
+    with open(in_filename) as inFile, open(out_filename, "w") as outFile:
+        lines = ( line.rstrip("\n") for line in inFile )
+        if max_workers == 1:
+            tagged = ( s for batch in batches(lines, batch_size)
+                       for s in tag_sentences_PT(batch) )
+        else:
+            tagged = tag_sentences_parallel(lines, batch_size, max_workers)
+        for s_tagged in tagged:
+            outFile.write(s_tagged + "\n")
 
 p5_1_sentences = [
     "I need a flight from Atlanta.",
@@ -25,7 +90,7 @@ p5_1_sentences = [
     ]
 
 def problem_5(sentences, heading):
-    ss_tagged = [ tag_sentence_PT(s) for s in sentences ]
+    ss_tagged = tag_sentences_PT(sentences)
     print(heading)
     for tagged in ss_tagged:
         print(tagged)
@@ -0,0 +1,279 @@
+"""
+Command line entry point for the N-gram tools.
+
+    python nlp_book_cli.py count    austen-emma.txt --out emma.ngmodel
+    python nlp_book_cli.py generate emma.ngmodel -n 10 --seed 1
+    python nlp_book_cli.py generate emma.ngmodel -n 100000 --workers 8
+    python nlp_book_cli.py decode   emma.ngmodel -k 5 --beam-width 100
+    python nlp_book_cli.py smooth   emma.ngmodel
+    python nlp_book_cli.py prune    austen-emma.txt --budget 2000000
+    python nlp_book_cli.py tag      sentences.txt tagged.txt
+    python nlp_book_cli.py bench    --sizes 10000 100000
+
+A source is a model file (.ngmodel), a plain text file, or a Gutenberg
+fileid.  Each subcommand imports only the modules it needs, so a short
+job does not pay for loading NLTK or corpora it does not use.
+"""
+
+import os
+import sys
+
+# Model file suffix
+MODEL_SUFFIX = ".ngmodel"
+
+# Sentences of a plain text file or a Gutenberg text
+def load_sents(source):
+    """
+    Return the sentences of a source, a text file or a Gutenberg fileid;
+    a text file's are generated as the file is read.
+    """
+    if os.path.exists(source):
+        from nlp_book_corpus_reader import MmapCorpusReader
+        return MmapCorpusReader(source).sents()
+    from nltk.corpus import gutenberg
+    return gutenberg.sents(source)
+
+# N-gram store for a source: loaded from a model file, or counted
+def load_store(source, max_order=3):
+    """
+    Return an NgramStore for a model file, text file, or Gutenberg fileid.
+    """
+    if source.endswith(MODEL_SUFFIX):
+        from nlp_book_model_file import load_model
+        return load_model(source).store
+    from nlp_book_ngram_store import NgramStore
+    return NgramStore.from_sents(load_sents(source), max_order)
+
+# count: count N-grams, optionally save a model file
+def cmd_count(args):
+    if args.approx:
+        return cmd_count_approx(args)
+    from nlp_book_parallel_counts import parallel_counts, serial_counts
+    fileids = [ s for s in args.sources if not os.path.exists(s) ]
+    filenames = [ s for s in args.sources if os.path.exists(s) ]
+    if args.workers == 1:
+        store = serial_counts(fileids, filenames, args.order)
+    else:
+        store = parallel_counts(fileids, filenames, args.order, args.workers)
+    for n in range(1, store.max_order + 1):
+        print("order", n, ":", store.size(n), "distinct,",
+              store.total(n), "total")
+    if args.top:
+        import numpy as np
+        from nlp_book_ngram_store import unpack
+        keys, counts = store.table(store.max_order)
+        top = np.argsort(counts)[::-1][:args.top]
+        words = store.vocab.words
+        rows = unpack(keys[top], store.max_order, store.bits)
+        for row, count in zip(rows.tolist(), counts[top].tolist()):
+            print(tuple([ words[i] for i in row ]), count)
+    if args.out:
+        from nlp_book_model_file import save_model
+        save_model(args.out, store)
+        print("saved", args.out)
+    return 0
+
+# count --approx: most common N-grams in fixed memory
+def cmd_count_approx(args):
+    from itertools import chain
+    from nlp_book_sketch import approx_count_ngrams_sents
+    sents = chain.from_iterable([ load_sents(s) for s in args.sources ])
+    n_sents, dists = approx_count_ngrams_sents(
+        sents, args.order, epsilon=args.epsilon, k=max(args.top, 1000))
+    for n, dist in enumerate(dists):
+        print("order", n + 1, ":", dist.N(), "total, counts within",
+              round(dist.error_bound(), 1))
+    for ngram, count in dists[-1].most_common(args.top):
+        print(ngram, count)
+    return 0
+
+# generate: random sentences from trigrams; from a model file always
+# by generate_parallel(), so a seed gives the same sentences with or
+# without --workers
+def cmd_generate(args):
+    if args.source.endswith(MODEL_SUFFIX):
+        return cmd_generate_parallel(args)
+    if args.workers is not None:
+        print("generate --workers: the source must be a model file")
+        return 2
+    from random import Random
+    from nlp_book_trigram_generator import TrigramGenerator, SentenceWriter
+    store = load_store(args.source)
+    generator = TrigramGenerator(store.unsmoothed_trigrams())
+    seeds = Random(args.seed)
+    writer = None
+    if args.out:
+        writer = SentenceWriter(args.out, args.jsonl)
+    try:
+        for i in range(args.count):
+            seed = seeds.getrandbits(32)
+            words, logprob = generator.generate(args.max_words, seed,
+                                                args.verbose)
+            sentence = " ".join(words)
+            if writer is not None:
+                writer.write(sentence, seed, logprob)
+            if writer is None or args.verbose >= 1:
+                print(sentence)
+    finally:
+        if writer is not None:
+            writer.close()
+    return 0
+
+# generate from a model file: reproducible sentences, in this process
+# or across a process pool
+def cmd_generate_parallel(args):
+    from nlp_book_parallel_generate import generate_parallel, master_seed
+    from nlp_book_trigram_generator import SentenceWriter
+    # without --seed, a fresh master seed, kept in the JSON records
+    seed = master_seed(args.seed)
+    workers = 1 if args.workers is None else args.workers
+    writer = None
+    if args.out:
+        writer = SentenceWriter(args.out, args.jsonl)
+    try:
+        for i, (words, logprob) in enumerate(generate_parallel(
+                args.source, args.count, seed, workers,
+                max_words=args.max_words)):
+            sentence = " ".join(words)
+            if writer is not None:
+                writer.write(sentence, seed, logprob, index=i)
+            if writer is None or args.verbose >= 1:
+                print(sentence)
+    finally:
+        if writer is not None:
+            writer.close()
+    return 0
+
+# decode: the most probable sentences, by beam search
+def cmd_decode(args):
+    from nlp_book_beam_search import BeamDecoder
+    store = load_store(args.source)
+    decoder = BeamDecoder(store.unsmoothed_trigrams())
+    context = tuple(args.context) if args.context else ('', '')
+    context = (('', '') + context)[-2:]
+    for words, logprob in decoder.decode(args.count, args.beam_width,
+                                         args.max_words, args.min_words,
+                                         context):
+        print(round(logprob, 4), " ".join(words), sep="\t")
+    return 0
+
+# smooth: Simple Good-Turing estimates for the counts of an order
+def cmd_smooth(args):
+    from nlp_book_good_turing import SimpleGoodTuring
+    store = load_store(args.source, max(3, args.order))
+    r, n_r = store.counts_of_counts(args.order)
+    sgt = SimpleGoodTuring(dict(zip(r.tolist(), n_r.tolist())))
+    print("a:", sgt.a, "b:", sgt.b, "P0:", sgt.p0,
+          "switch to LGT at r =", sgt.switch_r)
+    print("r", "Nr", "r*", "p", sep="\t")
+    for i in range(min(args.rows, len(sgt.r))):
+        print(int(sgt.r[i]), int(sgt.n[i]), sgt.r_star[i], sgt.p[i], sep="\t")
+    return 0
+
+# prune: prune a Kneser-Ney model, report size and held-out perplexity
+def cmd_prune(args):
+    from nlp_book_ngram_store import NgramStore
+    from nlp_book_kneser_ney import KneserNeyTrigramModel
+    from nlp_book_pruning import prune_report
+    sents = [ list(sent) for sent in load_sents(args.source) ]
+    n_heldout = max(1, int(len(sents) * args.heldout))
+    model = KneserNeyTrigramModel(NgramStore.from_sents(sents[:-n_heldout]))
+    pruned, report = prune_report(model, sents[-n_heldout:], args.size,
+                                  args.budget, args.cutoff)
+    for name in report:
+        print(name, ":", report[name])
+    return 0
+
+# tag: POS tag a file of sentences, one per line
+def cmd_tag(args):
+    from nlp_book_ch5_problems import tag_file
+    tag_file(args.input, args.output, args.batch_size, args.workers)
+    return 0
+
+# Command line parser
+def make_parser():
+    import argparse
+    parser = argparse.ArgumentParser(
+        prog="nlp_book_cli.py", description="N-gram tools.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    p = commands.add_parser('count', help="count N-grams")
+    p.add_argument('sources', nargs='+',
+                   help="Gutenberg fileids or text files")
+    p.add_argument('--order', type=int, default=3)
+    p.add_argument('--workers', type=int, default=None,
+                   help="worker processes (1: count serially)")
+    p.add_argument('--top', type=int, default=0,
+                   help="print the most common N-grams")
+    p.add_argument('--out', help="model file to save")
+    p.add_argument('--approx', action='store_true',
+                   help="approximate counts in fixed memory")
+    p.add_argument('--epsilon', type=float, default=1e-4,
+                   help="approximate count error, as a fraction of the total")
+    p.set_defaults(run=cmd_count)
+
+    p = commands.add_parser('generate', help="generate random sentences")
+    p.add_argument('source', help="model file, text file, or fileid")
+    p.add_argument('-n', '--count', type=int, default=10)
+    p.add_argument('--seed', type=int, default=None)
+    p.add_argument('--max-words', type=int, default=200)
+    p.add_argument('--out', help="sentences file to append to")
+    p.add_argument('--jsonl', help="JSON lines file for sentence records")
+    p.add_argument('-v', '--verbose', type=int, default=0)
+    p.add_argument('--workers', type=int, default=None,
+                   help="worker processes, for a model file: the same "
+                   "sentences for any number of workers, one by default")
+    p.set_defaults(run=cmd_generate)
+
+    p = commands.add_parser('decode', help="most probable sentences")
+    p.add_argument('source', help="model file, text file, or fileid")
+    p.add_argument('-k', '--count', type=int, default=5)
+    p.add_argument('--beam-width', type=int, default=50)
+    p.add_argument('--max-words', type=int, default=50)
+    p.add_argument('--min-words', type=int, default=1)
+    p.add_argument('--context', nargs='*',
+                   help="words to continue, the last two used")
+    p.set_defaults(run=cmd_decode)
+
+    p = commands.add_parser('smooth', help="Simple Good-Turing estimates")
+    p.add_argument('source', help="model file, text file, or fileid")
+    p.add_argument('--order', type=int, default=3)
+    p.add_argument('--rows', type=int, default=20)
+    p.set_defaults(run=cmd_smooth)
+
+    p = commands.add_parser('prune', help="prune a Kneser-Ney model")
+    p.add_argument('source', help="text file or fileid")
+    p.add_argument('--size', type=int, default=None,
+                   help="trigrams and bigrams to keep")
+    p.add_argument('--budget', type=int, default=None,
+                   help="bytes for the kept N-grams")
+    p.add_argument('--cutoff', type=int, default=None,
+                   help="drop N-grams seen no more than this many times")
+    p.add_argument('--heldout', type=float, default=0.05,
+                   help="fraction of sentences held out for perplexity")
+    p.set_defaults(run=cmd_prune)
+
+    p = commands.add_parser('tag', help="POS tag sentences, one per line")
+    p.add_argument('input')
+    p.add_argument('output')
+    p.add_argument('--batch-size', type=int, default=1000)
+    p.add_argument('--workers', type=int, default=1)
+    p.set_defaults(run=cmd_tag)
+
+    # handled in main(); listed here for --help
+    commands.add_parser('bench', help="run the benchmarks "
+                        "(options as for nlp_book_bench.py)")
+    return parser
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    # bench passes its options on to nlp_book_bench.py untouched
+    if len(argv) > 0 and argv[0] == 'bench':
+        from nlp_book_bench import main as bench_main
+        return bench_main(argv[1:])
+    args = make_parser().parse_args(argv)
+    return args.run(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,306 @@
+"""
+Memory-mapped plain text corpus reader.
+
+A text file is memory mapped, not read: the reader walks it one
+paragraph at a time, so only the current paragraph is ever decoded,
+and sentences and words are generated lazily, for files larger than
+memory.  Tokenization follows the NLTK PlaintextCorpusReader, as
+gutenberg.sents() does: paragraphs at blank lines, sentences by the
+Punkt sentence tokenizer (or any function given), and words by the
+wordpunct pattern.
+
+A file with few blank lines, e.g. one sentence per line or hard
+wrapped prose, would make one huge paragraph, so a paragraph is read at
+most max_block bytes at a time: a longer one is cut at its last line
+break within the limit (or its first line break past it, for a single
+longer line).  Where the file is cut depends only on the file and
+where the block starts, never on the end of the range being read.
+
+ranges() splits a file into byte ranges only at places where reading
+the whole file also cuts: at paragraph breaks (whose blank lines and
+following white space are skipped the same way from anywhere in them),
+or, where none follows the split point within max_block bytes, at the
+next block boundary of a whole-file read.  Parallel workers each
+reading one range therefore see exactly the sentences of the whole
+file, in the same pieces.
+
+The sentences feed the N-gram functions directly, e.g.
+
+    reader = MmapCorpusReader("big.txt")
+    store = NgramStore.from_sents(reader.sents(), chunk_tokens=10**7)
+    n_sents, dists = count_ngrams_sents(reader.sents())
+"""
+
+import mmap
+import os
+import re
+
+# Paragraph separator: a line with nothing but white space
+PARAGRAPH_BREAK = re.compile(r'\n[ \t\r\f\v]*\n')
+PARAGRAPH_BREAK_BYTES = re.compile(rb'\n[ \t\r\f\v]*\n')
+
+# White space skipped after a paragraph break
+SPACE_BYTES = re.compile(rb'[ \t\n\r\f\v]*')
+
+# Most bytes of a paragraph decoded at a time
+MAX_BLOCK = 1 << 20
+
+# Words and runs of punctuation, as nltk.tokenize.wordpunct_tokenize()
+WORDPUNCT = re.compile(r'\w+|[^\w\s]+')
+
+def wordpunct_tokenize(text):
+    return WORDPUNCT.findall(text)
+
+# Punkt sentence tokenizer, as used by the NLTK corpus readers
+def punkt_sent_tokenize(paragraph):
+    from nltk.tokenize import sent_tokenize
+    return sent_tokenize(paragraph)
+
+# Next paragraph break starting in data[position:limit], looking up to
+# max_block bytes past limit for its end; the break and the white space
+# after it are skipped to the same place from anywhere in them.
+def paragraph_break(data, position, limit, max_block=MAX_BLOCK):
+    """
+    Return ( start of the break, start of the next paragraph ),
+    or None if no break starts before limit.
+    """
+    match = PARAGRAPH_BREAK_BYTES.search(data, position,
+                                         min(len(data), limit + max_block))
+    if match is None or match.start() >= limit:
+        return None
+    return match.start(), SPACE_BYTES.match(data, match.end()).end()
+
+# End of the block of a mapped file starting at position.  The cut
+# depends only on the file and position, not on the range being read.
+def block_end(data, position, max_block=MAX_BLOCK):
+    """
+    Return ( stop, next position ): the block is data[position:stop],
+    up to the next paragraph break if it starts within max_block bytes,
+    else up to the last line break within them, else up to the next one.
+    """
+    size = len(data)
+    limit = min(size, position + max_block)
+    found = paragraph_break(data, position, limit, max_block)
+    if found is not None:
+        return found
+    if limit == size:
+        return size, size
+    newline = data.rfind(b'\n', position, limit)
+    if newline < 0:
+        newline = data.find(b'\n', limit)
+        if newline < 0:
+            return size, size
+    return newline, newline + 1
+
+# Sentences of a plain text, as lists of words, tokenized as by the
+# NLTK PlaintextCorpusReader: by paragraph, then sentence, then word.
+def text_sents(text, sent_tokenize=punkt_sent_tokenize):
+    """
+    Generate the sentences of a text, one list of words each.
+    """
+    for paragraph in PARAGRAPH_BREAK.split(text):
+        if paragraph.strip() == '':
+            continue
+        for sentence in sent_tokenize(paragraph):
+            yield wordpunct_tokenize(sentence)
+
+class MmapCorpusReader:
+    """
+    Stream the paragraphs, sentences, and words of a text file.
+    """
+
+    # The constructor takes the file name, its encoding, the function
+    # splitting a paragraph into sentence strings, and the most bytes
+    # of a paragraph decoded at a time.
+    def __init__(self, filename, encoding='utf-8',
+                 sent_tokenize=punkt_sent_tokenize, max_block=MAX_BLOCK):
+        """
+        Note the file; it is mapped when read.
+        """
+        self.filename = filename
+        self.encoding = encoding
+        self.sent_tokenize = sent_tokenize
+        self.max_block = max_block
+
+    # Size of the file in bytes
+    def size(self):
+        return os.path.getsize(self.filename)
+
+    # Paragraphs of a byte range of the file
+    def paragraphs(self, start=0, end=None):
+        """
+        Generate the non-blank paragraphs of bytes start .. end-1,
+        decoded one at a time, paragraphs longer than max_block bytes
+        in blocks of whole lines.
+        """
+        if end is None:
+            end = self.size()
+        if end <= start:
+            return
+        with open(self.filename, "rb") as inFile:
+            with mmap.mmap(inFile.fileno(), 0,
+                           access=mmap.ACCESS_READ) as data:
+                position = start
+                while position < end:
+                    stop, following = block_end(data, position,
+                                                self.max_block)
+                    stop = min(stop, end)
+                    paragraph = data[position:stop].decode(self.encoding)
+                    if paragraph.strip() != '':
+                        yield paragraph
+                    position = following
+
+    # Sentences of a byte range, as lists of words
+    def sents(self, start=0, end=None):
+        """
+        Generate the sentences of bytes start .. end-1 of the file.
+        """
+        for paragraph in self.paragraphs(start, end):
+            for sentence in self.sent_tokenize(paragraph):
+                yield wordpunct_tokenize(sentence)
+
+    # Words of a byte range
+    def words(self, start=0, end=None):
+        """
+        Generate the words of bytes start .. end-1 of the file.
+        """
+        for sent in self.sents(start, end):
+            yield from sent
+
+    # Split the file into byte ranges where a whole-file read cuts it
+    def ranges(self, n_ranges):
+        """
+        Return a list of ( start, end ) byte ranges covering the file,
+        about n_ranges of them, each ending after a paragraph break,
+        or, if no paragraph break follows the split point within
+        max_block bytes, at a block boundary of a whole-file read (found
+        by walking the blocks from the range's start, without decoding).
+        """
+        size = self.size()
+        if size == 0:
+            return []
+        if n_ranges <= 1:
+            return [ (0, size) ]
+        ranges = []
+        with open(self.filename, "rb") as inFile:
+            with mmap.mmap(inFile.fileno(), 0,
+                           access=mmap.ACCESS_READ) as data:
+                start = 0
+                for i in range(1, n_ranges):
+                    target = max(start, size * i // n_ranges)
+                    found = paragraph_break(
+                        data, target, min(size, target + self.max_block),
+                        self.max_block)
+                    if found is not None:
+                        end = found[1]
+                    else:
+                        end = start
+                        while end < target:
+                            end = block_end(data, end, self.max_block)[1]
+                    if end >= size:
+                        break
+                    if end > start:
+                        ranges.append((start, end))
+                        start = end
+                if start < size:
+                    ranges.append((start, size))
+        return ranges
+
+# Split a text file into byte ranges where a whole-file read cuts it
+def text_ranges(filename, n_ranges, max_block=MAX_BLOCK):
+    return MmapCorpusReader(filename, max_block=max_block).ranges(n_ranges)
+
+# Split paragraphs into sentences at ., !, or ? and white space:
+# much faster than Punkt, for very large corpora, but it also splits
+# after abbreviations such as "Mr."
+SENTENCE_END = re.compile(r'(?<=[.!?])["\')\]]*\s+')
+
+def simple_sent_tokenize(paragraph):
+    return [ s for s in SENTENCE_END.split(paragraph) if s.strip() != '' ]
+
+# ------------------------------------------------------------------------
+# Tests ---
+# ------------------------------------------------------------------------
+
+if __name__ == '__main__':
+
+    import tempfile
+    from nlp_book_ngram_store import NgramStore
+
+    text = ("Emma Woodhouse, handsome, clever, and rich. She was happy.\n"
+            "\n"
+            "It was Mr. Knightley!  Was it?\n"
+            "   \n"
+            "The end.\n")
+    filename = os.path.join(tempfile.mkdtemp(), "test.txt")
+    with open(filename, "w") as outFile:
+        outFile.write(text * 50)
+    reader = MmapCorpusReader(filename, sent_tokenize=simple_sent_tokenize)
+    sents = list(reader.sents())
+    assert sents == list(text_sents(text * 50, simple_sent_tokenize))
+    assert len(sents) == 300 and sents[2] == [ 'It', 'was', 'Mr', '.' ]
+    assert sum([ 1 for word in reader.words() ]) \
+        == sum([ len(sent) for sent in sents ])
+    ranges = reader.ranges(7)
+    assert ranges[0][0] == 0 and ranges[-1][1] == reader.size()
+    assert all([ a[1] == b[0] for a, b in zip(ranges, ranges[1:]) ])
+    pieces = [ sent for start, end in ranges
+               for sent in reader.sents(start, end) ]
+    assert pieces == sents
+    store = NgramStore.from_sents(reader.sents())
+    assert store.count(('', '', 'Emma')) == 50
+    assert store.count(('The', 'end', '.')) == 50
+    print(len(ranges), "ranges,", len(sents), "sentences")
+    os.remove(filename)
+
+    # one sentence per line, no blank lines
+    with open(filename, "w") as outFile:
+        outFile.write("Emma Woodhouse was happy.\nIt was Mr. Knightley!\n"
+                      * 2000)
+    reader = MmapCorpusReader(filename, sent_tokenize=simple_sent_tokenize,
+                              max_block=4096)
+    sents = list(reader.sents())
+    ranges = reader.ranges(4)
+    pieces = [ sent for start, end in ranges
+               for sent in reader.sents(start, end) ]
+    longest = max([ len(p) for p in reader.paragraphs() ])
+    assert len(ranges) == 4 and longest <= 4096
+    assert pieces == sents and len(sents) == 6000
+    print(len(ranges), "ranges,", longest, "longest block")
+    os.remove(filename)
+
+    # hard wrapped prose, sentences running over line ends, without
+    # blank lines, and with a few runs of blank lines
+    import random
+    import textwrap
+    rng = random.Random(7)
+    words = [ "Emma", "was", "handsome", "clever", "and", "rich", "Mr",
+              "Knightley", "said", "nothing", "at", "all" ]
+    prose = " ".join([ " ".join(rng.choice(words)
+                                for i in range(rng.randint(3, 30)))
+                       + rng.choice([ ".", "!", "?" ])
+                       for j in range(3000) ])
+    lines = textwrap.wrap(prose, 70)
+    for blank_lines in [ False, True ]:
+        if blank_lines:
+            text = "".join([ line + rng.choice([ "\n" ] * 20
+                                               + [ "\n\n", "\n  \n\n\n" ])
+                             for line in lines ])
+        else:
+            text = "\n".join(lines) + "\n"
+        with open(filename, "w") as outFile:
+            outFile.write(text)
+        for max_block in [ 150, 1000, 4096 ]:
+            reader = MmapCorpusReader(filename, max_block=max_block,
+                                      sent_tokenize=simple_sent_tokenize)
+            sents = list(reader.sents())
+            for n_ranges in [ 2, 3, 7, 20 ]:
+                ranges = reader.ranges(n_ranges)
+                assert ranges[-1][1] == reader.size()
+                assert all([ a[1] == b[0] for a, b in zip(ranges, ranges[1:]) ])
+                pieces = [ sent for start, end in ranges
+                           for sent in reader.sents(start, end) ]
+                assert pieces == sents, (blank_lines, max_block, n_ranges)
+            assert len(ranges) > 1
+    print("wrapped prose: range reads equal whole-file reads")
+    os.remove(filename)
@@ -0,0 +1,188 @@
+"""
+Simple Good-Turing smoothing.
+
+Gale, W. A. and G. Sampson, "Good-Turing Frequency Estimation Without
+Tears": average each Nr over the gap to its neighbouring non-zero counts
+(Zr), fit log Zr = a + b log r, and estimate the adjusted counts
+
+    r* = (r+1) N(r+1) / N(r)        (Turing estimate)
+    r* = (r+1) S(r+1) / S(r)        (linear Good-Turing, S(r) = e^a r^b)
+
+using the Turing estimate for small r, switching once to the LGT
+estimate when the two no longer differ significantly (by 1.96 standard
+deviations of the Turing estimate), or when N(r+1) is zero.
+Probabilities are renormalized so that the seen N-grams share 1 - P0,
+P0 = N1 / N being the probability mass for unseen N-grams.
+
+All steps over the counts of counts are vectorized with NumPy.
+"""
+
+import numpy as np
+
+class SimpleGoodTuring:
+    """
+    Simple Good-Turing estimates from counts of counts.
+    """
+
+    # The constructor takes the counts of counts { r : Nr },
+    # e.g. TG_counts_dist, and optionally the N-gram counts
+    # { ngram : r }, e.g. TG_dist, to serve per N-gram probabilities.
+    # n_unseen is the number of possible N-grams never seen,
+    # used to share the unseen mass P0 among them.
+    def __init__(self, counts_of_counts, dist=None, n_unseen=None):
+        """
+        Fit the Simple Good-Turing estimates.
+        """
+        r = np.array(sorted([ c for c in counts_of_counts
+                              if counts_of_counts[c] > 0 ]), dtype=float)
+        if len(r) < 2:
+            raise ValueError("SimpleGoodTuring: need at least two "
+                             "distinct non-zero counts")
+        n = np.array([ counts_of_counts[int(c)] for c in r ], dtype=float)
+        self.r = r
+        self.n = n
+        self.N = float((r * n).sum())
+        self.dist = dist
+        self.n_unseen = n_unseen
+        self._fit()
+
+    # Build from N-gram counts { ngram : r }, e.g. TG_dist
+    @classmethod
+    def from_freq_dist(cls, dist, n_unseen=None):
+        """
+        Compute the counts of counts of dist and fit them.
+        """
+        from collections import Counter
+        return cls(Counter(dist.values()), dist=dist, n_unseen=n_unseen)
+
+    # Fit the estimates
+    def _fit(self):
+        r, n = self.r, self.n
+        # Zr: Nr averaged over the gap from the previous to the next r
+        q = np.concatenate(([0.0], r[:-1]))
+        t = np.concatenate((r[1:], [2.0 * r[-1] - q[-1]]))
+        self.z = n / (0.5 * (t - q))
+        # log Zr = a + b log r
+        self.b, self.a = np.polyfit(np.log(r), np.log(self.z), 1)
+        # LGT estimates, from the fitted line
+        lgt = (r + 1.0) * np.exp(self.b * (np.log(r + 1.0) - np.log(r)))
+        # Turing estimates, from the observed N(r+1) (0 if none)
+        n_next = np.zeros(len(r))
+        follows = np.concatenate((r[1:] == r[:-1] + 1.0, [False]))
+        n_next[follows] = n[1:][follows[:-1]]
+        turing = (r + 1.0) * n_next / n
+        # use Turing until it is not significantly different from LGT
+        sd = np.sqrt((r + 1.0) ** 2 * (n_next / n ** 2) * (1.0 + n_next / n))
+        differ = (np.abs(turing - lgt) > 1.96 * sd) & (n_next > 0)
+        switch = len(r) if differ.all() else int(np.argmin(differ))
+        self.switch_r = r[switch] if switch < len(r) else None
+        self.r_star = np.where(np.arange(len(r)) < switch, turing, lgt)
+        # renormalize the seen mass to 1 - P0
+        self.p0 = n[0] / self.N if r[0] == 1.0 else 0.0
+        n_prime = (n * self.r_star).sum()
+        self.p = (1.0 - self.p0) * self.r_star / n_prime
+        self.p_of_count = dict(zip(r.astype(int).tolist(), self.p.tolist()))
+        self.r_star_of_count = dict(zip(r.astype(int).tolist(),
+                                        self.r_star.tolist()))
+
+    # Slope of the log-log fit; should be below -1 (Gale)
+    def slope(self):
+        return self.b
+
+    # Adjusted counts r*, as a dictionary { r : r* }
+    def counts_star(self):
+        """
+        Return { r : r* } for the observed counts r.
+        """
+        return dict(self.r_star_of_count)
+
+    # Adjusted count for a count r
+    def c_star(self, r):
+        """
+        Return r* for a count r; for an unobserved r > 0, the LGT
+        estimate, and for r = 0, N1 / N0, N0 being n_unseen.
+        """
+        if r == 0:
+            if not self.n_unseen:
+                raise ValueError("SimpleGoodTuring: c*(0) needs n_unseen")
+            n1 = self.n[0] if self.r[0] == 1.0 else 0.0
+            return n1 / self.n_unseen
+        c = self.r_star_of_count.get(r)
+        if c is None:
+            c = (r + 1.0) * ((r + 1.0) / r) ** self.b
+        return c
+
+    # Probability of one N-gram with count r
+    def prob_of_count(self, r):
+        """
+        Return the smoothed probability of an N-gram seen r times.
+        For r = 0, the unseen mass P0, shared among n_unseen N-grams
+        if that number was given.
+        """
+        if r == 0:
+            if self.n_unseen:
+                return self.p0 / self.n_unseen
+            return self.p0
+        p = self.p_of_count.get(r)
+        if p is None:
+            n_prime = (self.n * self.r_star).sum()
+            p = (1.0 - self.p0) * self.c_star(r) / n_prime
+        return p
+
+    # Probabilities for an array of counts, vectorized
+    def probs_of_counts(self, counts):
+        """
+        Return the smoothed probabilities for an array of observed
+        counts, all of which must occur in the counts of counts.
+        """
+        i = np.searchsorted(self.r, np.asarray(counts, dtype=float))
+        return self.p[i]
+
+    # Probability of an N-gram, from the N-gram counts
+    def prob(self, ngram):
+        """
+        Return the smoothed probability of an N-gram.
+        """
+        if self.dist is None:
+            raise ValueError("SimpleGoodTuring: no N-gram counts given")
+        return self.prob_of_count(self.dist.get(ngram, 0))
+
+    def __getitem__(self, ngram):
+        return self.prob(ngram)
+
+# ------------------------------------------------------------------------
+# Tests ---
+# ------------------------------------------------------------------------
+
+if __name__ == '__main__':
+
+    # Prosody example from Gale and Sampson
+    prosody = { 1:120, 2:40, 3:24, 4:13, 5:15, 6:5, 7:11, 8:2, 9:2, 10:1,
+                12:3, 14:2, 15:1, 16:1, 17:3, 19:1, 20:3, 21:2, 23:3,
+                24:3, 25:3, 26:2, 27:2, 28:1, 31:2, 32:2, 33:1, 34:2,
+                36:2, 41:3, 43:1, 45:3, 46:1, 47:1, 50:1, 71:1, 84:1,
+                101:1, 105:1, 121:1, 124:1, 146:1, 162:1, 193:1, 199:1,
+                224:1, 226:1, 254:1, 257:1, 339:1, 421:1, 456:1, 481:1,
+                483:1, 1140:1, 1256:1, 1322:1, 1530:1, 2131:1, 2395:1,
+                6925:1, 7846:1 }
+    sgt = SimpleGoodTuring(prosody)
+    print("a:", sgt.a, "b:", sgt.b, "P0:", sgt.p0, "switch at r =", sgt.switch_r)
+    assert sgt.slope() < -1.0
+    assert abs(sgt.p0 - 120.0 / sgt.N) < 1e-12
+    # the seen N-grams share 1 - P0
+    assert abs((sgt.n * sgt.p).sum() + sgt.p0 - 1.0) < 1e-9
+    # r* grows with r, and stays below r + 1
+    c_stars = [ sgt.c_star(r) for r in [1, 2, 3, 4, 5, 6, 7, 8] ]
+    assert all([ a < b for a, b in zip(c_stars, c_stars[1:]) ])
+    assert all([ c < r + 1 for r, c in zip(range(1, 9), c_stars) ])
+    for r in [1, 2, 3, 4, 5, 6, 7, 8]:
+        print(r, sgt.c_star(r), sgt.prob_of_count(r))
+    # c*(0) = N1 / N0, which needs the number of unseen N-grams
+    try:
+        sgt.c_star(0)
+        raise AssertionError("c_star(0) without n_unseen")
+    except ValueError:
+        pass
+    sgt = SimpleGoodTuring(prosody, n_unseen=1000)
+    assert sgt.c_star(0) == 120 / 1000
+    assert abs(sgt.prob_of_count(0) * 1000 - sgt.p0) < 1e-12
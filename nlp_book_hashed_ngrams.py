@@ -0,0 +1,218 @@
+"""
+N-gram counts keyed by 64-bit hashes, for vocabularies too large to pack.
+
+NgramStore packs an order-n N-gram into one int64 key while n ID fields
+fit in 63 bits (e.g. 2**21 words for trigrams).  Beyond that, each
+window of the padded ID stream is keyed by a polynomial hash,
+
+    h = ( ... ( id_1 B + id_2 ) B + ... ) B + id_n   mod 2**64
+
+computed for all windows at once, one NumPy multiply-add per word of
+the N-gram: no tuple or string is made per N-gram.  Different N-grams
+can share a hash, so after sorting, every window is compared with the
+first window of its hash; on any collision the counting is retried
+with another odd multiplier B.  Lookups compare the stored words too.
+
+The counted N-grams are kept as rows of word IDs in lexicographic
+order, so the N-grams starting with a prefix are one run of rows,
+found column by column with binary searches, as tri_grams_starting()
+finds them by a scan.
+"""
+
+import numpy as np
+
+from nlp_book_ngram_store import Vocabulary, padded_stream
+
+# Polynomial hashes of all length-n windows of an ID stream
+def window_hashes(stream, n, base):
+    """
+    Return the uint64 hash of every length-n window of stream.
+    """
+    stream = np.asarray(stream).astype(np.uint64)
+    m = len(stream) - n + 1
+    if m <= 0:
+        return np.zeros(0, dtype=np.uint64)
+    base = np.uint64(base)
+    hashes = stream[:m].copy()
+    for j in range(1, n):
+        hashes *= base
+        hashes += stream[j:j + m]
+    return hashes
+
+# Polynomial hashes of rows of word IDs, as window_hashes()
+def row_hashes(ids, base):
+    ids = np.asarray(ids).astype(np.uint64)
+    base = np.uint64(base)
+    hashes = ids[:, 0].copy()
+    for j in range(1, ids.shape[1]):
+        hashes *= base
+        hashes += ids[:, j]
+    return hashes
+
+# Odd 64-bit hash multipliers, one per try
+def hash_bases(seed, tries):
+    rng = np.random.default_rng(seed)
+    return [ int(b) | 1 for b in rng.integers(1 << 32, 1 << 63, size=tries,
+                                             dtype=np.int64) ]
+
+class HashedNgramCounts:
+    """
+    Counts of order-n N-grams, keyed by hashes checked for collisions.
+    """
+
+    # The constructor takes the vocabulary, the order, the hash
+    # multiplier, the N-grams as lexicographically sorted rows of
+    # word IDs, and their counts.
+    def __init__(self, vocab, n, base, ids, counts):
+        """
+        Index the rows by hash.
+        """
+        self.vocab = vocab
+        self.n = n
+        self.base = base
+        self.ids = ids
+        self.counts = counts
+        hashes = row_hashes(ids, base)
+        self.hash_order = np.argsort(hashes, kind='stable')
+        self.hashes = hashes[self.hash_order]
+
+    # Count the order-n N-grams of a list of sentences
+    @classmethod
+    def from_sents(cls, sents, n=3, vocab=None, seed=0, tries=4):
+        """
+        Intern the words and count the N-grams, padded as by
+        ngrams_sent().  Raises ValueError if every hash multiplier
+        tried gives a collision.
+        """
+        if vocab is None:
+            vocab = Vocabulary()
+        token_ids = []
+        sent_lengths = []
+        for sent in sents:
+            if len(sent) > 0:
+                token_ids.append(vocab.ids(sent))
+                sent_lengths.append(len(sent))
+        if len(token_ids) > 0:
+            token_ids = np.concatenate(token_ids)
+        else:
+            token_ids = np.zeros(0, dtype=np.int32)
+        stream = padded_stream(token_ids, sent_lengths, n)
+        for base in hash_bases(seed, tries):
+            result = count_windows(stream, n, base)
+            if result is not None:
+                ids, counts = result
+                return cls(vocab, n, base, ids, counts)
+        raise ValueError("HashedNgramCounts: hash collisions with "
+                         + str(tries) + " multipliers")
+
+    # Number of distinct N-grams
+    def __len__(self):
+        return len(self.counts)
+
+    # Word IDs for an N-gram, or None if a word is unknown
+    def ngram_ids(self, ngram):
+        ids = [ self.vocab.lookup(word) for word in ngram ]
+        if -1 in ids:
+            return None
+        return np.array(ids, dtype=np.int64)
+
+    # Count of an N-gram of words
+    def count(self, ngram):
+        """
+        Return the count of an order-n tuple of words.
+        """
+        ids = self.ngram_ids(ngram)
+        if ids is None or len(ids) != self.n:
+            return 0
+        h = window_hashes(ids, self.n, self.base)[0]
+        lo = int(np.searchsorted(self.hashes, h))
+        hi = int(np.searchsorted(self.hashes, h, side='right'))
+        for row in self.hash_order[lo:hi]:
+            if np.array_equal(self.ids[row], ids):
+                return int(self.counts[row])
+        return 0
+
+    def __getitem__(self, ngram):
+        return self.count(ngram)
+
+    # Rows of the N-grams that start with a prefix of words
+    def prefix_range(self, prefix):
+        """
+        Return ( lo, hi ): rows lo .. hi-1 of self.ids start with prefix.
+        """
+        ids = self.ngram_ids(prefix)
+        if ids is None:
+            return 0, 0
+        lo, hi = 0, len(self.counts)
+        for j, word_id in enumerate(ids.tolist()):
+            column = self.ids[lo:hi, j]
+            lo, hi = (lo + int(np.searchsorted(column, word_id)),
+                      lo + int(np.searchsorted(column, word_id, side='right')))
+        return lo, hi
+
+    # N-grams starting with a prefix, e.g. ( '', '' ), with counts
+    def starting(self, prefix):
+        """
+        Return [ ( ngram, count ) ] for the N-grams beginning with prefix.
+        """
+        lo, hi = self.prefix_range(prefix)
+        words = self.vocab.words
+        return [ (tuple([ words[i] for i in row ]), count)
+                 for row, count in zip(self.ids[lo:hi].tolist(),
+                                       self.counts[lo:hi].tolist()) ]
+
+    # N-grams as tuples of words, with their counts
+    def items(self):
+        return self.starting(())
+
+# Count the windows of a stream by hash, checking for collisions
+def count_windows(stream, n, base):
+    """
+    Return ( rows of word IDs in lexicographic order, counts ) of the
+    distinct length-n windows of stream, or None if two different
+    windows have the same hash.
+    """
+    hashes = window_hashes(stream, n, base)
+    m = len(hashes)
+    if m == 0:
+        return np.zeros((0, n), dtype=np.int32), np.zeros(0, dtype=np.int64)
+    order = np.argsort(hashes, kind='stable')
+    sorted_hashes = hashes[order]
+    new = np.concatenate(([True], sorted_hashes[1:] != sorted_hashes[:-1]))
+    starts = np.flatnonzero(new)
+    group = np.cumsum(new) - 1
+    first = order[starts][group]
+    # every window must equal the first window with its hash
+    for j in range(n):
+        if not np.array_equal(stream[order + j], stream[first + j]):
+            return None
+    counts = np.diff(np.concatenate((starts, [m])))
+    positions = order[starts]
+    ids = np.stack([ stream[positions + j] for j in range(n) ],
+                   axis=1).astype(np.int32)
+    lexical = np.lexsort(ids.T[::-1])
+    return ids[lexical], counts[lexical].astype(np.int64)
+
+# ------------------------------------------------------------------------
+# Tests ---
+# ------------------------------------------------------------------------
+
+if __name__ == '__main__':
+
+    from nlp_book_bench import zipf_sents
+    from nlp_book_nltk import count_ngrams_sents, tri_grams_starting
+
+    sents = zipf_sents(100000)
+    n_sents, dists = count_ngrams_sents(sents)
+    TG = HashedNgramCounts.from_sents(sents, 3)
+    assert len(TG) == len(dists[2])
+    assert all([ TG[gram] == count for gram, count in dists[2].items() ])
+    assert TG[('w1', 'w1', 'nonesuch')] == 0
+    assert TG[('w1', 'w2', 'w3')] == dists[2][('w1', 'w2', 'w3')]
+    starts = dict(TG.starting(('', '')))
+    expected = tri_grams_starting(dists[2].keys(), ('', ''))
+    assert starts == { gram : dists[2][gram] for gram in expected }
+    # a small multiplier makes colliding windows, and is replaced
+    stream = np.array([ 0, 0, 1, 2, 0, 0, 2, 1, 0, 0 ])
+    assert count_windows(stream, 3, 1) is None
+    print("distinct:", len(TG))
@@ -0,0 +1,209 @@
+"""
+HMM part-of-speech tagger with a vectorized log-space Viterbi decoder.
+
+Estimates initial, transition, and emission probabilities from a tagged
+corpus (lists of ( word, tag ) pairs, e.g. nltk.corpus.treebank
+.tagged_sents()) with add-alpha smoothing, stores their logs as NumPy
+matrices, and decodes with the Viterbi recurrence as matrix operations:
+
+    v[t, j] = max_i ( v[t-1, i] + log a[i, j] ) + log b[j, o_t]
+
+A batch of sentences is padded to its longest length and decoded
+together, one ( batch, tags, tags ) max per time step; finished
+sentences carry their Viterbi column forward unchanged.
+
+Cost: O(L T^2) per sentence of L words, T tags; no per-word Python work
+beyond looking up word IDs.
+"""
+
+import numpy as np
+
+# Log of probabilities, log(0) = -inf without warnings
+def log_probs(p):
+    with np.errstate(divide='ignore'):
+        return np.log(p)
+
+class HmmTagger:
+    """
+    Hidden Markov model tagger.
+    """
+
+    # The constructor takes the tags, the words (the last column of
+    # the emission matrix is for unknown words), and the log initial,
+    # transition, and emission probabilities: ( T ), ( T, T ), ( T, W+1 ).
+    def __init__(self, tags, words, log_initial, log_transition,
+                 log_emission):
+        """
+        Wrap the model's log probability matrices.
+        """
+        self.tags = list(tags)
+        self.words = list(words)
+        self.word_ids = { word : i for i, word in enumerate(self.words) }
+        self.unk_id = len(self.words)
+        self.log_initial = np.asarray(log_initial, dtype=float)
+        self.log_transition = np.asarray(log_transition, dtype=float)
+        self.log_emission = np.asarray(log_emission, dtype=float)
+
+    # Estimate the model from tagged sentences
+    @classmethod
+    def train(cls, tagged_sents, alpha=0.001):
+        """
+        Count tag starts, tag bigrams, and word/tag pairs, and
+        smooth each distribution by adding alpha to every count.
+        """
+        tag_ids = {}
+        word_ids = {}
+        starts = []
+        prev = []
+        curr = []
+        words = []
+        tags = []
+        for sent in tagged_sents:
+            if len(sent) == 0:
+                continue
+            ids = [ tag_ids.setdefault(tag, len(tag_ids))
+                    for word, tag in sent ]
+            starts.append(ids[0])
+            prev += ids[:-1]
+            curr += ids[1:]
+            tags += ids
+            words += [ word_ids.setdefault(word, len(word_ids))
+                       for word, tag in sent ]
+        T = len(tag_ids)
+        W = len(word_ids)
+        initial = np.bincount(starts, minlength=T) + alpha
+        transition = np.zeros((T, T))
+        np.add.at(transition, (prev, curr), 1.0)
+        transition += alpha
+        emission = np.zeros((T, W + 1))
+        np.add.at(emission, (tags, words), 1.0)
+        emission += alpha
+        return cls(sorted(tag_ids, key=tag_ids.get),
+                   sorted(word_ids, key=word_ids.get),
+                   log_probs(initial / initial.sum()),
+                   log_probs(transition / transition.sum(axis=1,
+                                                         keepdims=True)),
+                   log_probs(emission / emission.sum(axis=1,
+                                                     keepdims=True)))
+
+    # Word IDs, unknown words mapped to the UNK column
+    def observations(self, words):
+        get = self.word_ids.get
+        unk = self.unk_id
+        return np.array([ get(word, unk) for word in words ], dtype=np.int64)
+
+    # Viterbi decoding of a padded batch of observation sequences
+    def viterbi_batch(self, obs, lengths):
+        """
+        Decode an ( S, L ) array of word IDs, row s valid up to
+        lengths[s].  Returns the ( S, L ) best tag IDs and the
+        ( S ) best path log probabilities.
+        """
+        S, L = obs.shape
+        T = len(self.tags)
+        A = self.log_transition
+        B = self.log_emission
+        backpointers = np.zeros((S, L, T), dtype=np.int32)
+        v = self.log_initial[None, :] + B[:, obs[:, 0]].T
+        keep = np.arange(T, dtype=np.int32)
+        for t in range(1, L):
+            scores = v[:, :, None] + A[None, :, :]
+            best = scores.argmax(axis=1).astype(np.int32)
+            v_next = np.take_along_axis(scores, best[:, None, :],
+                                        axis=1)[:, 0, :]
+            v_next += B[:, obs[:, t]].T
+            active = t < lengths
+            v = np.where(active[:, None], v_next, v)
+            backpointers[:, t, :] = np.where(active[:, None], best, keep)
+        path = np.zeros((S, L), dtype=np.int32)
+        path[:, L - 1] = v.argmax(axis=1)
+        rows = np.arange(S)
+        for t in range(L - 1, 0, -1):
+            path[:, t - 1] = backpointers[rows, t, path[:, t]]
+        return path, v.max(axis=1)
+
+    # Tag one sentence
+    def tag(self, words):
+        """
+        Return a list of ( word, tag ) pairs.
+        """
+        return self.tag_sents([ words ])[0]
+
+    # Tag many sentences, in batches of similar length
+    def tag_sents(self, sents, batch_size=256):
+        """
+        Tag sentences, lists of words, returning a list of
+        ( word, tag ) lists in the input order.
+        """
+        sents = [ list(sent) for sent in sents ]
+        order = sorted(range(len(sents)), key=lambda i: len(sents[i]))
+        tagged = [ [] for sent in sents ]
+        for start in range(0, len(order), batch_size):
+            batch = [ i for i in order[start:start + batch_size]
+                      if len(sents[i]) > 0 ]
+            if not batch:
+                continue
+            lengths = np.array([ len(sents[i]) for i in batch ])
+            obs = np.full((len(batch), lengths.max()), self.unk_id,
+                          dtype=np.int64)
+            for row, i in enumerate(batch):
+                obs[row, :lengths[row]] = self.observations(sents[i])
+            path, logp = self.viterbi_batch(obs, lengths)
+            for row, i in enumerate(batch):
+                tagged[i] = [ (word, self.tags[tag]) for word, tag
+                              in zip(sents[i], path[row].tolist()) ]
+        return tagged
+
+    # Fraction of words tagged correctly
+    def accuracy(self, tagged_sents):
+        """
+        Tag the words of gold-standard tagged sentences and return
+        the fraction whose tags match.
+        """
+        gold = [ list(sent) for sent in tagged_sents ]
+        tagged = self.tag_sents([ [ word for word, tag in sent ]
+                                  for sent in gold ])
+        right = 0
+        total = 0
+        for gold_sent, sent in zip(gold, tagged):
+            for (word, gold_tag), (word, tag) in zip(gold_sent, sent):
+                right += gold_tag == tag
+                total += 1
+        return right / total if total else 0.0
+
+# ------------------------------------------------------------------------
+# Tests ---
+# ------------------------------------------------------------------------
+
+if __name__ == '__main__':
+
+    # Viterbi decoding example, NLP 2ed Fig 5.18: "I want to race"
+    tags = [ 'VB', 'TO', 'NN', 'PPSS' ]
+    words = [ 'I', 'want', 'to', 'race' ]
+    initial = [ .019, .0043, .041, .067 ]
+    transition = [ [ .0038, .035, .047, .0070 ],
+                   [ .83, 0, .00047, 0 ],
+                   [ .0040, .016, .087, .0045 ],
+                   [ .23, .00079, .0012, .00014 ] ]
+    emission = [ [ 0, .0093, 0, .00012, 0 ],
+                 [ 0, 0, .99, 0, 0 ],
+                 [ 0, .000054, 0, .00057, 0 ],
+                 [ .37, 0, 0, 0, 0 ] ]
+    tagger = HmmTagger(tags, words, log_probs(np.array(initial)),
+                       log_probs(np.array(transition)),
+                       log_probs(np.array(emission)))
+    tagged = tagger.tag([ 'I', 'want', 'to', 'race' ])
+    assert [ tag for word, tag in tagged ] == [ 'PPSS', 'VB', 'TO', 'VB' ]
+    assert tagger.tag_sents([ [ 'I', 'want' ], [], [ 'I', 'want', 'to',
+                                                     'race' ] ]) \
+        == [ tagged[:2], [], tagged ]
+    print(tagged)
+
+    tagged_sents = [ [ ('the', 'DT'), ('dog', 'NN'), ('runs', 'VBZ') ],
+                     [ ('a', 'DT'), ('cat', 'NN'), ('sleeps', 'VBZ') ],
+                     [ ('the', 'DT'), ('cat', 'NN'), ('runs', 'VBZ') ] ]
+    tagger = HmmTagger.train(tagged_sents)
+    assert tagger.tag([ 'a', 'dog', 'sleeps' ]) \
+        == [ ('a', 'DT'), ('dog', 'NN'), ('sleeps', 'VBZ') ]
+    assert tagger.accuracy(tagged_sents) == 1.0
+    print(tagger.accuracy(tagged_sents))
@@ -0,0 +1,161 @@
+"""
+Incrementally updated N-gram model.
+
+add_sentences() bumps the unigram, bigram, and trigram counts and keeps
+the counts of counts (Nc, e.g. TG_counts_dist) up to date as it goes:
+an N-gram going from count c to c+1 moves one from Nc to Nc+1, O(1).
+Conditional probabilities are recomputed lazily, only for the contexts
+whose counts changed since they were last asked for, and the Simple
+Good-Turing fit only for the orders whose counts of counts changed.
+"""
+
+from collections import Counter
+
+# Start of sentence bigram context
+START = ('', '',)
+
+class IncrementalNgramModel:
+    """
+    Unigram, bigram, and trigram counts that can be added to.
+    """
+
+    # The constructor takes an optional first list of sentences.
+    def __init__(self, sents=()):
+        """
+        Start with empty counts, then add the sentences.
+        """
+        self.n_sents = 0
+        self.UG_dist = Counter()
+        self.BG_dist = Counter()
+        self.TG_dist = Counter()
+        self.UG_counts_dist = Counter()
+        self.BG_counts_dist = Counter()
+        self.TG_counts_dist = Counter()
+        self.next_words = {}        # context -> set of next words
+        self.dirty = set()          # contexts changed since last asked
+        self.cache = {}             # context -> { next word : prob }
+        self.sgt = {}               # order -> SimpleGoodTuring
+        self.sgt_dirty = set([1, 2, 3])
+        self.add_sentences(sents)
+
+    # Count one N-gram, moving it from Nc to Nc+1
+    def _add(self, dist, counts_dist, gram):
+        c = dist[gram]
+        dist[gram] = c + 1
+        if c > 0:
+            if counts_dist[c] == 1:
+                del counts_dist[c]
+            else:
+                counts_dist[c] -= 1
+        counts_dist[c + 1] += 1
+
+    # Add sentences to the counts
+    def add_sentences(self, sents):
+        """
+        Count the N-grams of more sentences, padded as by
+        bi_grams_sent() and tri_grams_sent().
+        """
+        for sent in sents:
+            self.n_sents += 1
+            self.dirty.add(START)
+            if len(sent) == 0:
+                continue
+            words = ['', ''] + list(sent) + ['', '']
+            for word in sent:
+                self._add(self.UG_dist, self.UG_counts_dist, word)
+            for i in range(1, len(words) - 2):
+                self._add(self.BG_dist, self.BG_counts_dist,
+                          (words[i], words[i+1],))
+            for i in range(len(words) - 2):
+                trigram = (words[i], words[i+1], words[i+2],)
+                self._add(self.TG_dist, self.TG_counts_dist, trigram)
+                context = trigram[:2]
+                next_words = self.next_words.get(context)
+                if next_words is None:
+                    next_words = set()
+                    self.next_words[context] = next_words
+                next_words.add(trigram[2])
+                self.dirty.add(context)
+        self.sgt_dirty.update([1, 2, 3])
+
+    # Count of a bigram context; ('', '') occurs once per sentence
+    def context_count(self, context):
+        if context == START:
+            return self.n_sents
+        return self.BG_dist[context]
+
+    # Unsmoothed trigram probabilities for a context
+    def cond_probs(self, context):
+        """
+        Return { next word : P(next word | context) },
+        recomputed only if the context changed.
+        """
+        context = tuple(context)
+        if context in self.dirty or context not in self.cache:
+            count_context = self.context_count(context)
+            self.cache[context] = {
+                word : self.TG_dist[context + (word,)] / count_context
+                for word in self.next_words.get(context, ()) }
+            self.dirty.discard(context)
+        return self.cache[context]
+
+    # Unsmoothed trigram probability
+    def prob(self, trigram):
+        """
+        Return P(w3 | w1, w2), 0.0 for an unseen trigram.
+        """
+        return self.cond_probs(trigram[:2]).get(trigram[2], 0.0)
+
+    # Unsmoothed trigram probabilities, as unsmoothed_trigrams_sents()
+    def unsmoothed_trigrams(self):
+        utps = {}
+        for context in self.next_words:
+            for word, p in self.cond_probs(context).items():
+                utps[context + (word,)] = p
+        return utps
+
+    # Simple Good-Turing estimates for an order, refitted if changed.
+    # The unseen N-grams are those over the words seen and the pad ''.
+    def good_turing(self, n=3):
+        """
+        Return the SimpleGoodTuring fit for the order-n counts.
+        """
+        if n in self.sgt_dirty or n not in self.sgt:
+            from nlp_book_good_turing import SimpleGoodTuring
+            dist, counts_dist = [ (self.UG_dist, self.UG_counts_dist),
+                                  (self.BG_dist, self.BG_counts_dist),
+                                  (self.TG_dist, self.TG_counts_dist) ][n-1]
+            n_unseen = (len(self.UG_dist) + 1) ** n - len(dist)
+            self.sgt[n] = SimpleGoodTuring(counts_dist, dist=dist,
+                                           n_unseen=max(n_unseen, 1))
+            self.sgt_dirty.discard(n)
+        return self.sgt[n]
+
+    # Good-Turing adjusted count c* for an N-gram
+    def c_star(self, ngram):
+        n = 1 if isinstance(ngram, str) else len(ngram)
+        dist = [ self.UG_dist, self.BG_dist, self.TG_dist ][n-1]
+        return self.good_turing(n).c_star(dist.get(ngram, 0))
+
+# ------------------------------------------------------------------------
+# Tests ---
+# ------------------------------------------------------------------------
+
+if __name__ == '__main__':
+
+    from nltk import FreqDist
+    from nlp_book_nltk import tri_grams_sents
+
+    sents = [["One"], ["One", "."], ["One", "two", "."],
+             ['This', 'is', 'a', 'short', 'test', '.'],
+             ['This', 'is', 'a', 'test', '.'] ]
+    model = IncrementalNgramModel(sents[:2])
+    assert model.cond_probs(START) == { 'One' : 1.0 }
+    model.add_sentences(sents[2:])
+    assert model.cond_probs(START) == { 'One' : 0.6, 'This' : 0.4 }
+    TG_dist = FreqDist(tri_grams_sents(sents))
+    assert dict(model.TG_counts_dist) == dict(FreqDist(TG_dist.values()))
+    print(model.c_star(('', '', 'One')))
+    # an unseen trigram gets N1 / N0
+    sgt = model.good_turing(3)
+    assert model.c_star(('One', 'is', 'two')) == sgt.n[0] / sgt.n_unseen
@@ -0,0 +1,244 @@
+"""
+Stage timing and memory records, silent unless enabled.
+
+A function marks its stages:
+
+    with stage("count") as s:
+        n_sents, dists = count_ngrams_sents(sents)
+        s.count(sentences=n_sents, trigrams=len(dists[2]))
+
+While instrumentation is disabled, the default, stage() returns one
+shared do-nothing stage: no clock is read, nothing is printed or
+stored.  Once enabled, each stage produces one record,
+
+    {"stage": "problem_4_2/count", "seconds": ..., "rss_peak_bytes": ...,
+     "traced_peak_bytes": ..., "sentences": ..., "trigrams": ...}
+
+with nested stages named by their path.  Records go to a list, a JSON
+lines file, or a function:
+
+    recorder = enable("stages.jsonl", memory=True)
+    ...
+    disable()
+
+traced_peak_bytes, the peak Python allocation during the stage, is
+measured only with memory=True, since tracemalloc slows allocation
+several times over.  rss_peak_bytes is the rise of the process's peak
+resident set size, where the resource module is available.
+"""
+
+import json
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:     # not on Windows
+    resource = None
+
+class NullStage:
+    """
+    Stage used while instrumentation is disabled.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def count(self, **counts):
+        pass
+
+    # False, so that costly counts can be skipped:
+    #   if s: s.count(nc_bins=len(set(dist.values())))
+    def __bool__(self):
+        return False
+
+NULL_STAGE = NullStage()
+
+# Peak resident set size of this process, in bytes
+def rss_peak():
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+class Stage:
+    """
+    One timed stage of a Recorder.
+    """
+
+    def __init__(self, recorder, name):
+        self.recorder = recorder
+        self.record = { 'stage' : name }
+
+    def __enter__(self):
+        recorder = self.recorder
+        recorder.path.append(self.record['stage'])
+        self.record['stage'] = "/".join(recorder.path)
+        self.rss_start = rss_peak()
+        if recorder.memory:
+            self.traced_start = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        record = self.record
+        record['seconds'] = time.perf_counter() - self.start
+        recorder = self.recorder
+        if self.rss_start is not None:
+            record['rss_peak_bytes'] = rss_peak() - self.rss_start
+        if recorder.memory:
+            record['traced_peak_bytes'] = (tracemalloc.get_traced_memory()[1]
+                                           - self.traced_start)
+        if exc_info[0] is not None:
+            record['error'] = exc_info[0].__name__
+        recorder.path.pop()
+        recorder.emit(record)
+        return False
+
+    # Item counts for the record, e.g. tokens, unique N-grams, Nc bins
+    def count(self, **counts):
+        self.record.update(counts)
+
+    def __bool__(self):
+        return True
+
+class Recorder:
+    """
+    Collect stage records.
+    """
+
+    # The constructor takes where the records go: None to keep them in
+    # self.records, a file name or open file for JSON lines, or a
+    # function called with each record.
+    def __init__(self, sink=None, memory=False):
+        """
+        Start recording, tracing memory if wanted.
+        """
+        self.records = []
+        self.path = []
+        self.memory = memory
+        self.file = None
+        self.close_file = False
+        self.function = None
+        if isinstance(sink, str):
+            self.file = open(sink, "a")
+            self.close_file = True
+        elif callable(sink):
+            self.function = sink
+        elif sink is not None:
+            self.file = sink
+        self.started_tracing = False
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+
+    def emit(self, record):
+        if self.function is not None:
+            self.function(record)
+        elif self.file is not None:
+            self.file.write(json.dumps(record) + "\n")
+        else:
+            self.records.append(record)
+
+    def close(self):
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+        if self.close_file:
+            self.file.close()
+            self.close_file = False
+        elif self.file is not None:
+            self.file.flush()
+
+# The active recorder, None while disabled
+_recorder = None
+
+# Start a stage: a Stage while enabled, else the shared NullStage
+def stage(name):
+    if _recorder is None:
+        return NULL_STAGE
+    return Stage(_recorder, name)
+
+# Enable instrumentation
+def enable(sink=None, memory=False):
+    """
+    Start recording stages, replacing any active recorder.
+    Returns the Recorder.
+    """
+    global _recorder
+    disable()
+    _recorder = Recorder(sink, memory)
+    return _recorder
+
+# Disable instrumentation
+def disable():
+    """
+    Stop recording, closing the active recorder if any.
+    Returns the recorder, e.g. for its records.
+    """
+    global _recorder
+    recorder = _recorder
+    _recorder = None
+    if recorder is not None:
+        recorder.close()
+    return recorder
+
+def enabled():
+    return _recorder is not None
+
+class instrumented:
+    """
+    Enable instrumentation for a with block:
+
+        with instrumented() as recorder:
+            problem_4_2('austen-emma.txt')
+        print(recorder.records)
+    """
+
+    def __init__(self, sink=None, memory=False):
+        self.sink = sink
+        self.memory = memory
+
+    def __enter__(self):
+        return enable(self.sink, self.memory)
+
+    def __exit__(self, *exc_info):
+        disable()
+        return False
+
+# ------------------------------------------------------------------------
+# Tests ---
+# ------------------------------------------------------------------------
+
+if __name__ == '__main__':
+
+    # the module imported by nlp_book_nltk, not this __main__ copy
+    import nlp_book_instrument as instrument
+    from nlp_book_bench import zipf_sents
+    from nlp_book_nltk import unsmoothed_trigrams_sents
+    from nlp_book_nltk import cummulative_probabilities
+    from nlp_book_nltk import choose_by_probability_bin_search
+
+    sents = zipf_sents(100000)
+    start = time.perf_counter()
+    utps = unsmoothed_trigrams_sents(sents)
+    print("disabled:", time.perf_counter() - start, "seconds")
+    with instrument.instrumented(memory=True) as recorder:
+        utps = unsmoothed_trigrams_sents(sents)
+        utcps = cummulative_probabilities(utps)
+        choose_by_probability_bin_search(utcps)
+    assert [ record['stage'] for record in recorder.records ] \
+        == [ 'unsmoothed_trigrams_sents/count_ngrams_sents',
+             'unsmoothed_trigrams_sents/probabilities',
+             'unsmoothed_trigrams_sents',
+             'choose_by_probability_bin_search' ]
+    assert recorder.records[0]['tokens'] == sum([ len(s) for s in sents ])
+    assert all([ 'seconds' in record and 'traced_peak_bytes' in record
+                 for record in recorder.records ])
+    assert not instrument.enabled()
+    for record in recorder.records:
+        print(json.dumps(record))
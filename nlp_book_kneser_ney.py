@@ -0,0 +1,210 @@
+"""
+Interpolated Kneser-Ney trigram model, precomputed into arrays.
+
+Built from the trigram counts of an NgramStore, so it uses the same ''
+padding as tri_grams_sent().  With one absolute discount per order,
+D = N1 / (N1 + 2 N2) (Chen and Goodman):
+
+  P3(w | u v) = max(c(u v w) - D3, 0) / c(u v .)
+                + D3 N1+(u v .) / c(u v .) * P2(w | v)
+  P2(w | v)   = max(N1+(. v w) - D2, 0) / N1+(. v .)
+                + D2 N1+(v .) / N1+(. v .) * P1(w)
+  P1(w)       = max(N1+(. w) - D1, 0) / N1+(. .)
+                + D1 N1+(.) / N1+(. .) / V
+
+where N1+(. v w) is the number of distinct words seen before v w
+(continuation counts), and V the vocabulary size.  An unseen context
+backs off to the lower order with weight 1.
+
+At build time, P3 of every seen trigram, P2 of every seen bigram, P1 of
+every word, and the interpolation weights of every context are stored
+in arrays parallel to sorted packed keys.  A query is four binary
+searches of the key arrays (np.searchsorted, O(log n) each), for the
+trigram, its context weight, the bigram, and its context weight, and
+one direct index for P1; nothing is summed or counted per query.
+"""
+
+import numpy as np
+
+# Absolute discount from counts of counts
+def discount(counts):
+    """
+    Return D = N1 / (N1 + 2 N2) for an array of counts.
+    """
+    n1 = np.count_nonzero(counts == 1)
+    n2 = np.count_nonzero(counts == 2)
+    if n1 + 2 * n2 == 0:
+        return 0.5
+    return n1 / (n1 + 2.0 * n2)
+
+# Group boundaries of a sorted key array
+def groups(keys):
+    """
+    Return ( distinct keys, start index of each, size of each ).
+    """
+    if len(keys) == 0:
+        return keys, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    sizes = np.diff(np.concatenate((starts, [len(keys)])))
+    return keys[starts], starts, sizes
+
+# Positions of keys in a sorted table, -1 where not found
+def lookup(table, keys):
+    keys = np.asarray(keys, dtype=np.int64)
+    if len(table) == 0:
+        return np.full(keys.shape, -1, dtype=np.int64)
+    i = np.minimum(np.searchsorted(table, keys), len(table) - 1)
+    return np.where(table[i] == keys, i, -1)
+
+class KneserNeyTrigramModel:
+    """
+    Interpolated Kneser-Ney trigram probabilities, precomputed.
+    """
+
+    # The constructor takes an NgramStore with trigram counts.
+    def __init__(self, store):
+        """
+        Compute the discounts, continuation counts, interpolation
+        weights, and the probabilities of all seen N-grams.
+        """
+        self.store = store
+        bits = store.bits
+        mask = (1 << bits) - 1
+        V = len(store.vocab)
+        keys3, c3 = store.table(3)
+        keys3 = np.asarray(keys3, dtype=np.int64)
+        c3 = np.asarray(c3, dtype=np.int64)
+
+        # bigram (v w) continuation counts N1+(. v w): trigram types
+        # sharing the suffix v w
+        suffix = keys3 & ((1 << (2 * bits)) - 1)
+        suffix_sorted = np.sort(suffix)
+        keys2, starts, n1_vw = groups(suffix_sorted)
+        # unigram continuation counts N1+(. w): bigram types ending in w
+        n1_w = np.bincount(keys2 & mask, minlength=V)
+
+        self.D1 = discount(n1_w[n1_w > 0])
+        self.D2 = discount(n1_vw)
+        self.D3 = discount(c3)
+
+        # P1(w), all words
+        n1_total = max(int(n1_w.sum()), 1)
+        n_types = np.count_nonzero(n1_w)
+        self.p1 = (np.maximum(n1_w - self.D1, 0.0) / n1_total
+                   + self.D1 * n_types / n1_total / V)
+
+        # bigram contexts v: N1+(. v .) and N1+(v .)
+        ctx2, starts2, types2 = groups(keys2 >> bits)
+        total2 = np.add.reduceat(n1_vw, starts2) if len(starts2) else n1_vw
+        self.ctx2_keys = ctx2
+        self.gamma2 = self.D2 * types2 / total2
+        # P2(w | v), seen bigrams
+        total2_of = np.repeat(total2, types2)
+        gamma2_of = np.repeat(self.gamma2, types2)
+        self.keys2 = keys2
+        self.p2 = (np.maximum(n1_vw - self.D2, 0.0) / total2_of
+                   + gamma2_of * self.p1[keys2 & mask])
+
+        # trigram contexts u v: c(u v .) and N1+(u v .)
+        ctx3, starts3, types3 = groups(keys3 >> bits)
+        total3 = np.add.reduceat(c3, starts3) if len(starts3) else c3
+        self.ctx3_keys = ctx3
+        self.gamma3 = self.D3 * types3 / total3
+        # P3(w | u v), seen trigrams
+        total3_of = np.repeat(total3, types3)
+        gamma3_of = np.repeat(self.gamma3, types3)
+        self.keys3 = keys3
+        self.p3 = (np.maximum(c3 - self.D3, 0.0) / total3_of
+                   + gamma3_of * self.p2_of_keys(suffix))
+        self.logp3 = np.log(self.p3)
+
+    # P2(w | v) for packed bigram keys
+    def p2_of_keys(self, keys2):
+        """
+        Return P2 for an array of packed (v w) keys.
+        """
+        bits = self.store.bits
+        keys2 = np.asarray(keys2, dtype=np.int64)
+        p = self.p1[keys2 & ((1 << bits) - 1)].copy()
+        ctx = lookup(self.ctx2_keys, keys2 >> bits)
+        seen_ctx = ctx >= 0
+        p[seen_ctx] *= self.gamma2[ctx[seen_ctx]]
+        i = lookup(self.keys2, keys2)
+        seen = i >= 0
+        p[seen] = self.p2[i[seen]]
+        return p
+
+    # P3(w | u v) for packed trigram keys
+    def probs_of_keys(self, keys3):
+        """
+        Return P3 for an array of packed (u v w) keys.
+        """
+        bits = self.store.bits
+        keys3 = np.asarray(keys3, dtype=np.int64)
+        p = self.p2_of_keys(keys3 & ((1 << (2 * bits)) - 1))
+        ctx = lookup(self.ctx3_keys, keys3 >> bits)
+        seen_ctx = ctx >= 0
+        p[seen_ctx] *= self.gamma3[ctx[seen_ctx]]
+        i = lookup(self.keys3, keys3)
+        seen = i >= 0
+        p[seen] = self.p3[i[seen]]
+        return p
+
+    # log P3 for packed trigram keys, for TrigramScorer
+    def logprobs_of_keys(self, keys3):
+        return np.log(self.probs_of_keys(keys3))
+
+    # Probability of a trigram of words
+    def prob(self, trigram):
+        """
+        Return P(w | u v) for a trigram ( u, v, w ); 0.0 if a word
+        is not in the vocabulary.
+        """
+        key = self.store.key(trigram)
+        if key < 0:
+            return 0.0
+        return float(self.probs_of_keys(np.array([key]))[0])
+
+    # Probabilities of every word following a context
+    def cond_probs(self, context):
+        """
+        Return an array of P(w | u v) for every word ID w.
+        """
+        bits = self.store.bits
+        ctx = self.store.key(tuple(context))
+        if ctx < 0:
+            return np.zeros(len(self.store.vocab))
+        w = np.arange(len(self.store.vocab), dtype=np.int64)
+        return self.probs_of_keys((ctx << bits) | w)
+
+    # Scorer for batches of sentences
+    def scorer(self):
+        """
+        Return a TrigramScorer using these probabilities.
+        """
+        from nlp_book_scoring import TrigramScorer
+        return TrigramScorer(self.store, model=self)
+
+# ------------------------------------------------------------------------
+# Tests ---
+# ------------------------------------------------------------------------
+
+if __name__ == '__main__':
+
+    from nlp_book_ngram_store import NgramStore
+
+    sents = [["One"], ["One", "."], ["One", "two", "."],
+             ['This', 'is', 'a', 'short', 'test', '.'],
+             ['This', 'is', 'a', 'test', '.'] ]
+    store = NgramStore.from_sents(sents)
+    model = KneserNeyTrigramModel(store)
+    print("D1, D2, D3:", model.D1, model.D2, model.D3)
+    for context in [ ('', ''), ('This', 'is'), ('is', 'a'), ('two', 'is') ]:
+        p = model.cond_probs(context)
+        assert abs(p.sum() - 1.0) < 1e-9, (context, p.sum())
+    assert model.prob(('is', 'a', 'test')) > model.prob(('is', 'a', 'two')) > 0
+    print(model.prob(('is', 'a', 'test')), model.prob(('is', 'a', 'two')))
+    scorer = model.scorer()
+    perplexity = scorer.perplexity(sents + [['One', 'is', '.']])
+    assert 1.0 < perplexity < len(store.vocab)
+    print("perplexity:", perplexity)
@@ -0,0 +1,305 @@
+"""
+Binary N-gram model files, loaded with numpy.memmap.
+
+A model file holds an NgramStore (vocabulary and count tables), the
+counts of counts for each order, the Simple Good-Turing smoothed
+probability of each N-gram, and the running totals of the highest
+order's counts, for sampling (nlp_book_parallel_generate).  Layout:
+
+    b'NGMODEL1'                 magic
+    uint64                      header length in bytes
+    header                      JSON: scalars, and for each array
+                                its name, dtype, shape, and offset
+    arrays                      raw, each aligned to 64 bytes
+
+Loading reads only the header and the vocabulary; the count and
+probability arrays are memory mapped read-only, so they are paged in
+on demand and shared between processes that load the same file.
+Files are written to a temporary file and renamed into place, so a
+process that has a model file mapped keeps its old copy while it is
+rebuilt, and readers never see a partly written file.
+"""
+
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from nlp_book_ngram_store import NgramStore, Vocabulary
+
+# File identifier and version
+MAGIC = b'NGMODEL1'
+
+# Array alignment in the file, bytes
+ALIGN = 64
+
+# Separator between words in the stored vocabulary
+WORD_SEP = '\0'
+
+class ModelFile:
+    """
+    An N-gram model read from a model file.
+    """
+
+    # The constructor takes the store, and for each order the
+    # counts of counts ( r, Nr ) and the smoothed probabilities,
+    # parallel to the store's keys (None if not smoothed), and the
+    # running totals of the highest order's counts (None if not saved),
+    # and the file header's scalars.
+    def __init__(self, store, counts_of_counts, probs, filename=None,
+                 cumulative=None, header=None):
+        """
+        Wrap the model's arrays.
+        """
+        self.header = header or {}
+        self.store = store
+        self.counts_of_counts = counts_of_counts
+        self.probs = probs
+        self.filename = filename
+        self.cumulative = cumulative
+        self.good_turing_fits = {}
+
+    # Counts of counts for an order, as a dictionary { r : Nr }
+    def counts_dist(self, n):
+        r, n_r = self.counts_of_counts[n - 1]
+        return dict(zip(r.tolist(), n_r.tolist()))
+
+    # Simple Good-Turing fit of an order's counts of counts, made on
+    # first use; the unseen mass P0 is shared among all the N-grams
+    # over the vocabulary (pads included) not seen.
+    def good_turing(self, n):
+        sgt = self.good_turing_fits.get(n)
+        if sgt is None:
+            from nlp_book_good_turing import SimpleGoodTuring
+            n_unseen = len(self.store.vocab) ** n - self.store.size(n)
+            sgt = SimpleGoodTuring(self.counts_dist(n),
+                                   n_unseen=max(n_unseen, 1))
+            self.good_turing_fits[n] = sgt
+        return sgt
+
+    # Smoothed probability of an N-gram
+    def prob(self, ngram):
+        """
+        Return the stored smoothed probability of a seen N-gram, or for
+        an unseen one its share of the unseen mass P0.
+        """
+        if isinstance(ngram, str):
+            ngram = (ngram,)
+        n = len(ngram)
+        probs = self.probs[n - 1]
+        if probs is None:
+            raise ValueError("ModelFile: order " + str(n) + " not smoothed")
+        key = self.store.key(ngram)
+        keys = self.store.table(n)[0]
+        if key >= 0 and len(keys) > 0:
+            i = int(np.searchsorted(keys, key))
+            if i < len(keys) and keys[i] == key:
+                return float(probs[i])
+        return self.good_turing(n).prob_of_count(0)
+
+# Smoothed probabilities for the N-grams of one order
+def smoothed_probs(store, n):
+    """
+    Return the Simple Good-Turing probabilities of the order-n N-grams,
+    parallel to the store's keys, or None if they cannot be fitted.
+    """
+    from nlp_book_good_turing import SimpleGoodTuring
+    r, n_r = store.counts_of_counts(n)
+    try:
+        sgt = SimpleGoodTuring(dict(zip(r.tolist(), n_r.tolist())))
+    except ValueError:
+        return None
+    return sgt.probs_of_counts(store.table(n)[1])
+
+# Vocabulary words as a uint8 array of NUL separated utf-8
+def vocab_array(vocab):
+    for word in vocab.words:
+        if WORD_SEP in word:
+            raise ValueError("vocab_array: word contains NUL: " + repr(word))
+    vocab_bytes = WORD_SEP.join(vocab.words).encode('utf-8')
+    return np.frombuffer(vocab_bytes, dtype=np.uint8)
+
+# Vocabulary from an array written by vocab_array()
+def vocab_from_array(a):
+    vocab = Vocabulary()
+    vocab.words = bytes(a).decode('utf-8').split(WORD_SEP)
+    vocab.word_ids = dict(zip(vocab.words, range(len(vocab.words))))
+    return vocab
+
+# Write a file of named arrays after a JSON header
+def write_arrays(filename, header, arrays, magic=MAGIC):
+    """
+    Write magic, the header with an entry for each ( name, array ),
+    and the arrays, each aligned to ALIGN bytes.  The file is written
+    under a temporary name in the same directory, then renamed.
+    """
+    entries = []
+    offset = 0
+    for name, a in arrays:
+        entries.append({ 'name' : name, 'dtype' : a.dtype.str,
+                         'shape' : list(a.shape), 'offset' : offset })
+        offset += -(-a.nbytes // ALIGN) * ALIGN
+    header = dict(header, arrays=entries)
+    header_bytes = json.dumps(header).encode('utf-8')
+    data_start = len(magic) + 8 + len(header_bytes)
+    data_start = -(-data_start // ALIGN) * ALIGN
+    directory = os.path.dirname(os.path.abspath(filename))
+    descriptor, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "wb") as outFile:
+            outFile.write(magic)
+            outFile.write(np.uint64(len(header_bytes)).tobytes())
+            outFile.write(header_bytes)
+            for entry, (name, a) in zip(entries, arrays):
+                outFile.seek(data_start + entry['offset'])
+                outFile.write(np.ascontiguousarray(a).tobytes())
+            outFile.truncate(data_start + offset)
+        os.replace(temp_path, filename)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+# Read a file written by write_arrays(), memory mapping its arrays
+def read_arrays(filename, magic=MAGIC):
+    """
+    Return ( header, { name : array } ), the arrays memory mapped
+    read-only.
+    """
+    with open(filename, "rb") as inFile:
+        if inFile.read(len(magic)) != magic:
+            raise ValueError("read_arrays: not a " + magic.decode('ascii')
+                             + " file: " + filename)
+        header_length = int(np.frombuffer(inFile.read(8), dtype=np.uint64)[0])
+        header = json.loads(inFile.read(header_length).decode('utf-8'))
+    data_start = len(magic) + 8 + header_length
+    data_start = -(-data_start // ALIGN) * ALIGN
+    arrays = {}
+    for entry in header['arrays']:
+        shape = tuple(entry['shape'])
+        if np.prod(shape) == 0:
+            arrays[entry['name']] = np.zeros(shape, dtype=entry['dtype'])
+            continue
+        arrays[entry['name']] = np.memmap(filename, dtype=entry['dtype'],
+                                          mode='r', shape=shape,
+                                          offset=data_start + entry['offset'])
+    return header, arrays
+
+# Save a store, its counts of counts, and smoothed probabilities
+def save_model(filename, store, smooth=True, header=None):
+    """
+    Write an NgramStore to a model file, with any extra header
+    scalars, e.g. the digest of the corpus counted.
+    """
+    arrays = [ ('vocab', vocab_array(store.vocab)) ]
+    for n in range(1, store.max_order + 1):
+        keys, counts = store.table(n)
+        r, n_r = store.counts_of_counts(n)
+        arrays += [ ('keys_' + str(n), keys),
+                    ('counts_' + str(n), counts),
+                    ('r_' + str(n), r),
+                    ('n_r_' + str(n), n_r) ]
+        if smooth:
+            probs = smoothed_probs(store, n)
+            if probs is not None:
+                arrays += [ ('probs_' + str(n), probs) ]
+    counts = store.table(store.max_order)[1]
+    arrays += [ ('cumulative', np.cumsum(counts, dtype=np.int64)) ]
+    header = dict(header or {}, bits=store.bits, n_sents=store.n_sents,
+                  max_order=store.max_order)
+    write_arrays(filename, header, arrays)
+
+# Load a model file, memory mapping its arrays
+def load_model(filename):
+    """
+    Read a model file written by save_model().
+    """
+    header, arrays = read_arrays(filename)
+    vocab = vocab_from_array(arrays['vocab'])
+    max_order = header['max_order']
+    tables = []
+    counts_of_counts = []
+    probs = []
+    for n in range(1, max_order + 1):
+        tables.append((arrays['keys_' + str(n)], arrays['counts_' + str(n)],))
+        counts_of_counts.append((arrays['r_' + str(n)],
+                                 arrays['n_r_' + str(n)],))
+        probs.append(arrays.get('probs_' + str(n)))
+    store = NgramStore(vocab, header['bits'], header['n_sents'], tables)
+    scalars = { name : value for name, value in header.items()
+                if name != 'arrays' }
+    return ModelFile(store, counts_of_counts, probs, filename,
+                     arrays.get('cumulative'), scalars)
+
+# Digest of the code that counts and smooths a model, so a model file
+# written by older code is rebuilt
+def model_code_digest():
+    import nlp_book_good_turing
+    import nlp_book_model_file
+    import nlp_book_ngram_store
+    from nlp_book_cache import code_digest
+    return code_digest(nlp_book_ngram_store, nlp_book_good_turing,
+                       nlp_book_model_file)
+
+# Model for a Gutenberg text, built and saved on the first call,
+# loaded from <fileid>.ngmodel after that; rebuilt if the file holds
+# a different max_order, or was counted from a different corpus file
+# or by different code.
+def gutenberg_model(fileid, model_filename=None, max_order=3):
+    """
+    Load the model for a Gutenberg text, building it if needed.
+    """
+    from nltk.corpus import gutenberg
+    from nlp_book_cache import file_digest
+    if model_filename is None:
+        model_filename = fileid + ".ngmodel"
+    wanted = { 'max_order' : max_order,
+               'corpus_digest' : file_digest(gutenberg.abspath(fileid)),
+               'code_digest' : model_code_digest() }
+    if os.path.exists(model_filename):
+        model = load_model(model_filename)
+        if all([ model.header.get(name) == value
+                 for name, value in wanted.items() ]):
+            return model
+    store = NgramStore.from_sents(gutenberg.sents(fileid), max_order)
+    save_model(model_filename, store,
+               header={ name : wanted[name]
+                        for name in [ 'corpus_digest', 'code_digest' ] })
+    return load_model(model_filename)
+
+# ------------------------------------------------------------------------
+# Tests ---
+# ------------------------------------------------------------------------
+
+if __name__ == '__main__':
+
+    sents = [["One"], ["One", "."], ["One", "two", "."],
+             ['This', 'is', 'a', 'short', 'test', '.'],
+             ['This', 'is', 'a', 'test', '.'] ]
+    store = NgramStore.from_sents(sents)
+    filename = os.path.join(tempfile.mkdtemp(), "test.ngmodel")
+    save_model(filename, store)
+    model = load_model(filename)
+    assert model.store.unsmoothed_trigrams() == store.unsmoothed_trigrams()
+    assert model.counts_dist(3) == { 1 : 12, 2 : 4, 3 : 1, 4 : 1 }
+    print(model.prob(('', '', 'One')), model.prob(('is', 'a', 'test')))
+    # the seen trigrams and their unseen share of P0 sum to one
+    keys = model.store.table(3)[0]
+    n_unseen = len(model.store.vocab) ** 3 - len(keys)
+    unseen = model.prob(('not', 'a', 'word'))
+    assert unseen > 0 and unseen == model.prob(('a', 'short', 'One'))
+    assert abs(model.probs[2].sum() + n_unseen * unseen - 1.0) < 1e-9
+    # rewriting a mapped file leaves the old mapping intact, and no
+    # temporary file behind; extra header scalars are kept
+    old_keys = model.store.table(3)[0]
+    before = old_keys.tolist()
+    save_model(filename, NgramStore.from_sents(sents[:2]),
+               header={ 'corpus_digest' : 'abc' })
+    assert old_keys.tolist() == before
+    rebuilt = load_model(filename)
+    assert rebuilt.header['corpus_digest'] == 'abc'
+    assert rebuilt.store.n_sents == 2
+    assert os.listdir(os.path.dirname(filename)) == [ "test.ngmodel" ]
+    assert len(model_code_digest()) == 64
+    os.remove(filename)
@@ -0,0 +1,512 @@
+"""
+Integer-interned, array-backed N-gram counts.
+
+Words are interned as int32 IDs in a Vocabulary, with ID 0 reserved for
+the sentence padding word ''.  Each N-gram of order n is packed into one
+int64 key, n fields of `bits` bits each, first word in the high bits.
+An NgramStore keeps, for each order, the sorted keys in one NumPy array
+and the counts in a parallel array; lookups are binary searches.
+
+Padding follows bi_grams_sent() and tri_grams_sent(): order n N-grams
+for a sentence are the windows over n-1 '' words, the sentence, and
+n-1 '' words.  Sentences are joined with n-1 shared '' words between
+them, which gives exactly the same windows (no window spans two
+sentences), so all windows of all sentences are cut in one pass.
+"""
+
+from array import array
+
+import numpy as np
+
+# Sentence padding word, and its ID
+PAD = ''
+PAD_ID = 0
+
+class Vocabulary:
+    """
+    Map words to int32 IDs and back.
+    """
+
+    # The constructor takes an optional list of words to intern.
+    def __init__(self, words=()):
+        """
+        Start with just the padding word, ID 0.
+        """
+        self.word_ids = { PAD : PAD_ID }
+        self.words = [ PAD ]
+        for word in words:
+            self.id(word)
+
+    # Number of words, including the padding word
+    def __len__(self):
+        return len(self.words)
+
+    def __contains__(self, word):
+        return word in self.word_ids
+
+    # ID for a word, interning it if new
+    def id(self, word):
+        """
+        Return the ID for a word, adding the word if it is new.
+        """
+        word_id = self.word_ids.get(word)
+        if word_id is None:
+            word_id = len(self.words)
+            self.word_ids[word] = word_id
+            self.words.append(word)
+        return word_id
+
+    # ID for a word, without interning it
+    def lookup(self, word, default=-1):
+        """
+        Return the ID for a word, or default if it is unknown.
+        """
+        return self.word_ids.get(word, default)
+
+    # IDs for a list of words, as an int32 array
+    def ids(self, words, add=True):
+        """
+        Return the IDs for words as an int32 array.
+        Unknown words are added, or mapped to -1 if add is False.
+        """
+        if add:
+            return np.fromiter(( self.id(word) for word in words ),
+                               dtype=np.int32)
+        get = self.word_ids.get
+        return np.fromiter(( get(word, -1) for word in words ),
+                           dtype=np.int32)
+
+    # Word for an ID
+    def word(self, word_id):
+        return self.words[word_id]
+
+    # Pickle just the words; the ID map is rebuilt on unpickling
+    def __getstate__(self):
+        return self.words
+
+    def __setstate__(self, words):
+        self.words = words
+        self.word_ids = dict(zip(words, range(len(words))))
+
+# Bits per word ID needed for a vocabulary size
+def id_bits(vocab_size):
+    """
+    Return the number of bits to hold IDs 0 .. vocab_size-1.
+    """
+    return max(1, (vocab_size - 1).bit_length())
+
+# Pack rows of word IDs into int64 keys
+def pack(ids, bits):
+    """
+    Pack an ( m, n ) array of word IDs into m int64 keys.
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    if ids.ndim == 1:
+        ids = ids.reshape(1, -1)
+    keys = np.zeros(ids.shape[0], dtype=np.int64)
+    for j in range(ids.shape[1]):
+        keys = (keys << bits) | ids[:, j]
+    return keys
+
+# Unpack int64 keys into rows of word IDs
+def unpack(keys, n, bits):
+    """
+    Unpack int64 keys into an ( m, n ) array of word IDs.
+    """
+    keys = np.asarray(keys, dtype=np.int64)
+    mask = (1 << bits) - 1
+    ids = np.empty((keys.shape[0], n), dtype=np.int32)
+    for j in range(n):
+        ids[:, n - 1 - j] = (keys >> (bits * j)) & mask
+    return ids
+
+# Padded ID stream for order n N-grams
+def padded_stream(token_ids, sent_lengths, n):
+    """
+    Insert n-1 padding IDs before, between, and after the sentences.
+    sent_lengths must not include empty sentences.
+    """
+    pad = n - 1
+    n_sents = len(sent_lengths)
+    stream = np.zeros(len(token_ids) + pad * (n_sents + 1), dtype=np.int64)
+    sent_index = np.repeat(np.arange(n_sents, dtype=np.int64), sent_lengths)
+    positions = np.arange(len(token_ids), dtype=np.int64)
+    stream[positions + pad * (sent_index + 1)] = token_ids
+    return stream
+
+# Packed keys for all windows of order n over an ID stream
+def window_keys(stream, n, bits):
+    """
+    Pack every length-n window of an ID stream into an int64 key.
+    """
+    m = len(stream) - n + 1
+    if m <= 0:
+        return np.zeros(0, dtype=np.int64)
+    keys = np.zeros(m, dtype=np.int64)
+    for j in range(n):
+        keys = (keys << bits) | stream[j:j + m]
+    return keys
+
+# Sorted distinct keys and their counts
+def count_keys(keys):
+    keys, counts = np.unique(np.asarray(keys, dtype=np.int64),
+                             return_counts=True)
+    return keys, counts.astype(np.int64)
+
+# Merge ( keys, counts ) tables, summing the int64 counts of equal keys
+def merge_counts(tables):
+    """
+    Return one ( sorted keys, counts ) table for a list of tables.
+    """
+    if len(tables) == 1:
+        return tables[0]
+    keys = np.concatenate([ table[0] for table in tables ])
+    counts = np.concatenate([ np.asarray(table[1], dtype=np.int64)
+                              for table in tables ])
+    if len(keys) == 0:
+        return keys, counts
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+    counts = counts[order]
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    return keys[starts], np.add.reduceat(counts, starts)
+
+# Merge block count tables pairwise, as in a binary counter: each
+# entry of the stack is ( number of blocks, tables ), and two entries
+# of the same size are merged, so a count is merged about log2 times.
+def push_block(stack, tables):
+    size = 1
+    while stack and stack[-1][0] == size:
+        size += stack[-1][0]
+        tables = [ merge_counts([ a, b ])
+                   for a, b in zip(stack.pop()[1], tables) ]
+    stack.append((size, tables,))
+
+# Range of sorted order-n keys that start with a packed prefix
+def prefix_range(keys, prefix_key, prefix_n, n, bits):
+    """
+    Return ( lo, hi ): keys[lo:hi] are the order-n keys whose first
+    prefix_n words pack to prefix_key.  keys may be any sorted int64
+    buffer, e.g. a NumPy array or an array('q').
+    """
+    keys = np.asarray(keys, dtype=np.int64)
+    shift = bits * (n - prefix_n)
+    lo = int(np.searchsorted(keys, prefix_key << shift))
+    hi = int(np.searchsorted(keys, (prefix_key + 1) << shift))
+    return lo, hi
+
+# Count tables for orders 1 .. max_order of a block of sentences
+def count_block(token_ids, sent_lengths, max_order, bits):
+    """
+    Return [ ( sorted keys, counts ) ] for each order, for int32 token
+    IDs of non-empty sentences of the given lengths.
+    """
+    tables = []
+    for n in range(1, max_order + 1):
+        if n == 1:
+            keys = token_ids.astype(np.int64)
+        else:
+            stream = padded_stream(token_ids, sent_lengths, n)
+            keys = window_keys(stream, n, bits)
+        tables.append(count_keys(keys))
+    return tables
+
+class NgramStore:
+    """
+    Counts of N-grams of orders 1 .. max_order, as packed integer keys.
+    """
+
+    # The constructor takes the vocabulary, the ID width in bits,
+    # the number of sentences, and for each order 1 .. max_order
+    # a pair of parallel arrays ( sorted keys, counts ).
+    def __init__(self, vocab, bits, n_sents, tables):
+        """
+        Wrap count tables built by from_sents() or loaded from a file.
+        """
+        self.vocab = vocab
+        self.bits = bits
+        self.n_sents = n_sents
+        self.tables = tables
+        self.max_order = len(tables)
+
+    # Count the N-grams in a list of sentences
+    @classmethod
+    def from_sents(cls, sents, max_order=3, vocab=None, chunk_tokens=None):
+        """
+        Intern the words of the sentences and count their N-grams,
+        orders 1 .. max_order, padded as by bi_grams_sent(),
+        tri_grams_sent().  With chunk_tokens, the sentences are counted
+        in blocks of about that many tokens, merged pairwise as they
+        complete, so memory holds the tokens of one block plus about
+        log2(blocks) partial count tables, each at most the size of the
+        final tables; the keys are packed with 63 // max_order bits
+        until the end.
+        """
+        if vocab is None:
+            vocab = Vocabulary()
+        if chunk_tokens is None:
+            chunk_bits = None
+        else:
+            chunk_bits = 63 // max_order
+        token_ids = array('i')
+        sent_lengths = []
+        stack = []
+        n_sents = 0
+        for sent in sents:
+            n_sents += 1
+            if len(sent) > 0:
+                token_ids.extend(vocab.id(word) for word in sent)
+                sent_lengths.append(len(sent))
+                if chunk_bits is not None and len(token_ids) >= chunk_tokens:
+                    cls.check_bits(len(vocab), chunk_bits, max_order)
+                    push_block(stack, count_block(
+                        np.frombuffer(token_ids, dtype=np.int32),
+                        sent_lengths, max_order, chunk_bits))
+                    token_ids = array('i')
+                    sent_lengths = []
+        bits = id_bits(len(vocab))
+        cls.check_bits(len(vocab), bits, max_order)
+        token_ids = np.frombuffer(token_ids, dtype=np.int32)
+        if chunk_bits is None:
+            tables = count_block(token_ids, sent_lengths, max_order, bits)
+            return cls(vocab, bits, n_sents, tables)
+        cls.check_bits(len(vocab), chunk_bits, max_order)
+        push_block(stack, count_block(token_ids, sent_lengths, max_order,
+                                      chunk_bits))
+        tables = []
+        for n in range(1, max_order + 1):
+            keys, counts = merge_counts([ entry[1][n - 1]
+                                         for entry in stack ])
+            # repacking keeps the key order: IDs compare the same way
+            keys = pack(unpack(keys, n, chunk_bits), bits)
+            tables.append((keys, counts,))
+        return cls(vocab, bits, n_sents, tables)
+
+    # Check that order max_order keys of bits-wide IDs fit in an int64
+    @staticmethod
+    def check_bits(vocab_size, bits, max_order):
+        if vocab_size > (1 << bits) or bits * max_order > 63:
+            raise ValueError("NgramStore: vocabulary of " + str(vocab_size)
+                             + " words is too large for order "
+                             + str(max_order))
+
+    # Sorted keys and counts for an order
+    def table(self, n):
+        return self.tables[n - 1]
+
+    # Number of distinct N-grams of an order
+    def size(self, n):
+        return len(self.tables[n - 1][0])
+
+    # Total number of N-grams of an order
+    def total(self, n):
+        return int(self.tables[n - 1][1].sum())
+
+    # Packed key for an N-gram of words, or -1 if a word is unknown
+    def key(self, ngram):
+        """
+        Return the packed key for a tuple of words.
+        """
+        key = 0
+        for word in ngram:
+            word_id = self.vocab.lookup(word)
+            if word_id < 0:
+                return -1
+            key = (key << self.bits) | word_id
+        return key
+
+    # Counts for packed keys of one order
+    def counts_of(self, keys, n):
+        """
+        Look up the counts of an array of packed order-n keys;
+        0 for keys not in the store.
+        """
+        table_keys, table_counts = self.tables[n - 1]
+        keys = np.asarray(keys, dtype=np.int64)
+        counts = np.zeros(keys.shape, dtype=np.int64)
+        if len(table_keys) == 0:
+            return counts
+        i = np.searchsorted(table_keys, keys)
+        i = np.minimum(i, len(table_keys) - 1)
+        found = table_keys[i] == keys
+        counts[found] = table_counts[i[found]]
+        return counts
+
+    # N-grams of an order that start with a prefix of words
+    def starting(self, prefix, n=None):
+        """
+        Return ( keys, counts ), views of the order-n table (default:
+        the highest order) for the N-grams beginning with prefix, e.g.
+        ( '', '' ) for sentence starts; empty if a word is unknown.
+        """
+        if n is None:
+            n = self.max_order
+        keys, counts = self.tables[n - 1]
+        prefix_key = self.key(prefix)
+        if prefix_key < 0:
+            return keys[:0], counts[:0]
+        lo, hi = prefix_range(keys, prefix_key, len(prefix), n, self.bits)
+        return keys[lo:hi], counts[lo:hi]
+
+    # Count of an N-gram of words
+    def count(self, ngram):
+        """
+        Return the count of an N-gram, a word or a tuple of words.
+        """
+        if isinstance(ngram, str):
+            ngram = (ngram,)
+        key = self.key(ngram)
+        if key < 0:
+            return 0
+        return int(self.counts_of(np.array([key]), len(ngram))[0])
+
+    def __getitem__(self, ngram):
+        return self.count(ngram)
+
+    # Context counts for packed order-n keys, n >= 2.
+    # The all-padding context ( '', ... ) occurs once per sentence,
+    # as in unsmoothed_bigrams_sents() and unsmoothed_trigrams_sents().
+    def context_counts(self, keys, n):
+        """
+        Return the counts of the first n-1 words of order-n keys.
+        """
+        contexts = np.asarray(keys, dtype=np.int64) >> self.bits
+        counts = self.counts_of(contexts, n - 1)
+        counts[contexts == 0] = self.n_sents
+        return counts
+
+    # Counts of counts for an order, as arrays ( r, Nr )
+    def counts_of_counts(self, n):
+        """
+        Return the distinct counts r of the order-n N-grams, ascending,
+        and the number Nr of N-grams with each count.
+        """
+        r, n_r = np.unique(self.tables[n - 1][1], return_counts=True)
+        return r.astype(np.int64), n_r.astype(np.int64)
+
+    # N-grams of an order as tuples of words, with their counts
+    def items(self, n):
+        """
+        Yield ( ngram, count ) for the order-n N-grams;
+        unigrams as words, higher orders as tuples of words.
+        """
+        keys, counts = self.tables[n - 1]
+        words = self.vocab.words
+        rows = unpack(keys, n, self.bits)
+        for row, count in zip(rows.tolist(), counts.tolist()):
+            if n == 1:
+                yield words[row[0]], count
+            else:
+                yield tuple([ words[i] for i in row ]), count
+
+    # Counts of an order as a FreqDist
+    def freq_dist(self, n):
+        """
+        Return the order-n counts as an NLTK FreqDist.
+        """
+        from nltk import FreqDist
+        return FreqDist(dict(self.items(n)))
+
+    # Unsmoothed probabilities for an order, as a dictionary
+    def unsmoothed(self, n):
+        """
+        Return { ngram : P(last word | context) } for order n,
+        or { word : P(word) } for unigrams.
+        """
+        keys, counts = self.tables[n - 1]
+        if n == 1:
+            probs = counts / counts.sum()
+        else:
+            probs = counts / self.context_counts(keys, n)
+        items = self.items(n)
+        return { ngram : prob
+                 for (ngram, count), prob in zip(items, probs.tolist()) }
+
+    # Same results as unsmoothed_unigrams_sents()
+    def unsmoothed_unigrams(self):
+        return self.unsmoothed(1)
+
+    # Same results as unsmoothed_bigrams_sents()
+    def unsmoothed_bigrams(self):
+        return self.unsmoothed(2)
+
+    # Same results as unsmoothed_trigrams_sents()
+    def unsmoothed_trigrams(self):
+        return self.unsmoothed(3)
+
+    # Memory used by the count tables, in bytes
+    def nbytes(self):
+        return sum([ keys.nbytes + counts.nbytes
+                     for keys, counts in self.tables ])
+
+# Merge count shards into one store
+def merge_stores(stores):
+    """
+    Merge NgramStores counted from consecutive parts of a corpus.
+    Words get IDs in order of first occurrence across the shards,
+    so the result is identical to counting the whole corpus at once.
+    """
+    stores = list(stores)
+    max_order = min([ store.max_order for store in stores ])
+    vocab = Vocabulary()
+    id_maps = []
+    for store in stores:
+        id_maps.append(vocab.ids(store.vocab.words))
+    bits = id_bits(len(vocab))
+    if bits * max_order > 63:
+        raise ValueError("merge_stores: vocabulary of " + str(len(vocab))
+                         + " words is too large for order " + str(max_order))
+    tables = []
+    for n in range(1, max_order + 1):
+        all_keys = []
+        all_counts = []
+        for store, id_map in zip(stores, id_maps):
+            keys, counts = store.table(n)
+            ids = id_map[unpack(keys, n, store.bits)]
+            all_keys.append(pack(ids, bits))
+            all_counts.append(np.asarray(counts, dtype=np.int64))
+        tables.append(merge_counts(list(zip(all_keys, all_counts))))
+    n_sents = sum([ store.n_sents for store in stores ])
+    return NgramStore(vocab, bits, n_sents, tables)
+
+# ------------------------------------------------------------------------
+# Tests ---
+# ------------------------------------------------------------------------
+
+if __name__ == '__main__':
+
+    from nlp_book_nltk import unsmoothed_unigrams_sents
+    from nlp_book_nltk import unsmoothed_bigrams_sents
+    from nlp_book_nltk import unsmoothed_trigrams_sents
+
+    sents = [[], ["One"], ["One", "."], ["One", "two", "."],
+             ['This', 'is', 'a', 'short', 'test', '.'] ]
+    store = NgramStore.from_sents(sents)
+    print(store.freq_dist(3).most_common(5))
+    assert store.count(('', '', 'One')) == 3 and store.count('One') == 3
+    assert store.unsmoothed_unigrams() == unsmoothed_unigrams_sents(sents)
+    assert store.unsmoothed_bigrams() == unsmoothed_bigrams_sents(sents)
+    assert store.unsmoothed_trigrams() == unsmoothed_trigrams_sents(sents)
+    print("bytes:", store.nbytes())
+    # counting in chunks gives the same tables
+    for chunk_tokens in [ 1, 4 ]:
+        chunked = NgramStore.from_sents(sents * 3, chunk_tokens=chunk_tokens)
+        tripled = NgramStore.from_sents(sents * 3)
+        assert all([ np.array_equal(a, b) for n in range(1, 4)
+                     for a, b in zip(chunked.table(n), tripled.table(n)) ])
+    # merged counts stay exact past float64 precision
+    big = (1 << 53) + 1
+    keys, counts = merge_counts([ (np.array([ 1, 2 ]), np.array([ big, 1 ])),
+                                  (np.array([ 1 ]), np.array([ 2 ])) ])
+    assert keys.tolist() == [ 1, 2 ] and counts.tolist() == [ big + 2, 1 ]
+    # merged stores give the serial counts
+    merged = merge_stores([ NgramStore.from_sents(sents[:2]),
+                            NgramStore.from_sents(sents[2:]) ])
+    assert merged.n_sents == store.n_sents
+    for n in range(1, 4):
+        assert dict(merged.items(n)) == dict(store.items(n))
+    keys, counts = store.starting(('', ''))
+    following = [ store.vocab.word(int(k) & ((1 << store.bits) - 1))
+                  for k in keys ]
+    assert sorted(following) == [ 'One', 'This' ]
+    print(following, counts)
@@ -1,7 +1,13 @@
 # nlp_book_nltk: Define functions to solve NLP book problems with NLTK
 # Sig Nin 2018-08-08
+#
+# NLTK takes most of a second to import, so it is imported by the
+# functions that use it, not when this module is imported.
+#
+# Stages are timed and counted with nlp_book_instrument.stage(),
+# which records nothing unless instrumentation is enabled.
 
-from nltk import *
+from nlp_book_instrument import stage
 
 # Compute bigrams from a list of word tokens
 def bi_grams(words):
@@ -22,10 +28,7 @@ def bi_grams_sent(sent):
 
 # Compute unsmoothed bigram probabilities from a list of sentences
 def bi_grams_sents(sents):
-    grams = []
-    for sent in sents:
-        grams += bi_grams_sent(sent)
-    return grams
+    return list(ngrams_sents(sents, 2))
 
 # Compute trigrams from a list of word tokens
 def tri_grams(words):
@@ -39,27 +42,36 @@ def tri_grams(words):
 # The next to last trigram is ( <next to last word>, <last word>, '' ).
 # The last trigram is ( <last word>, '', '' ).
 def tri_grams_sent(sent):
-    grams = []
-    if len(sent) == 1:
-        grams = [('', '', sent[0],), ('', sent[0], '',), (sent[0], '', '',)]
-    if len(sent) == 2:
-        grams = [('', '', sent[0],), ('', sent[0], sent[1],),
-                 (sent[0], sent[1], '',), (sent[1], '', '',)]
-    if len(sent) > 2:
-        grams  = [('', '', sent[0],), ('', sent[0], sent[1],)]
-        grams += tri_grams(sent)
-        grams += [(sent[-2], sent[-1], '',), (sent[-1], '', '',)]
-    return grams
+    return list(ngrams_sent(sent, 3))
 
 # Compute unsmoothed trigram probabilities from a list of sentences
 def tri_grams_sents(sents):
-    grams = []
+    return list(ngrams_sents(sents, 3))
+
+# Generate the Ngrams of order n from a sentence
+# comprising a list of words (including punctuation),
+# padded with n-1 pad words at each end, as for bigrams and trigrams:
+# the first Ngram is ( pad, ..., pad, <first word> ),
+# the last Ngram is ( <last word>, pad, ..., pad ).
+# An empty sentence has no Ngrams.
+def ngrams_sent(sent, n, pad=''):
+    if len(sent) == 0:
+        return
+    padding = [pad] * (n - 1)
+    words = padding + list(sent) + padding
+    for i in range(len(words) - n + 1):
+        yield tuple(words[i:i+n])
+
+# Generate the padded Ngrams of order n from a list of sentences,
+# one at a time, e.g. to count them without building a list:
+#   FreqDist(ngrams_sents(sents, 3))
+def ngrams_sents(sents, n, pad=''):
     for sent in sents:
-        grams += tri_grams_sent(sent)
-    return grams
+        yield from ngrams_sent(sent, n, pad)
 
 # Compute unsmoothed unigram probabilities from a list of words
 def unsmoothed_unigrams(words):
+    from nltk import FreqDist
     dist_words = FreqDist(words)    # unigram counts
     pgrams = {}
     for gram in set(words):
@@ -70,13 +82,12 @@ def unsmoothed_unigrams(words):
 
 # Compute unsmoothed unigram probabilities from a list of sentences
 def unsmoothed_unigrams_sents(sents):
-    words = []
-    for sent in sents:
-        words += sent
-    return unsmoothed_unigrams(words)
+    n_sents, dists = count_ngrams_sents(sents, 1)
+    return unigram_probabilities(dists[0])
 
 # Compute unsmoothed bigram probabilities from a list of words
 def unsmoothed_bigrams(words):
+    from nltk import FreqDist
     grams = bi_grams(words)
     dist_words = FreqDist(words)    # unigram counts
     dist_grams = FreqDist(grams)    # bigram counts
@@ -91,29 +102,12 @@ def unsmoothed_bigrams(words):
 
 # Compute unsmoothed bigram probabilities from a list of sentences
 def unsmoothed_bigrams_sents(sents):
-    words = []
-    for sent in sents:
-        words += ['']    # start of sentence
-        words += sent
-    grams = []
-    for sent in sents:
-        grams += bi_grams_sent(sent)
-    dist_words = FreqDist(words)    # unigram counts
-    dist_grams = FreqDist(grams)    # bigram counts
-    pgrams = {}
-    for iGram in range(len(grams)):
-        gram = grams[iGram]
-        count_gram = dist_grams[gram]
-        count_word_0 = dist_words[gram[0]]
-        try:
-            pgram = count_gram / count_word_0
-            pgrams[gram] = pgram
-        except ZeroDivisionError:
-            print("zero word count for:", "'", gram[0], "'")
-    return pgrams
+    n_sents, dists = count_ngrams_sents(sents, 2)
+    return bigram_probabilities(n_sents, dists[0], dists[1])
 
 # Compute unsmoothed trigram probabilities from a list of words
 def unsmoothed_trigrams(words):
+    from nltk import FreqDist
     N2grams = bi_grams(words)
     N3grams = tri_grams(words)
     dist_N2 = FreqDist(N2grams)    # bigram counts
@@ -130,34 +124,82 @@ def unsmoothed_trigrams(words):
 
 # Compute unsmoothed trigram probabilities from a list of sentences
 def unsmoothed_trigrams_sents(sents):
-    print("sents: ", sents[:5])
-    N2grams = []
-    N3grams = []
-    count = 0
-    for sent in sents:
-        if count < 5:
-            print("sent: ", sent)
-        N2grams += [('', '',)]   # start of sentence
-        N2grams += bi_grams_sent(sent)
-        N3grams += tri_grams_sent(sent)
-        count += 1
-    print("bigrams: ", N2grams[:40])
-    print("trigrams: ", N3grams[:40])
-    dist_N2 = FreqDist(N2grams)    # bigram counts
-    dist_N3 = FreqDist(N3grams)    # trigram counts
+    with stage("unsmoothed_trigrams_sents"):
+        n_sents, dists = count_ngrams_sents(sents, 3)
+        with stage("probabilities") as s:
+            utps = trigram_probabilities(n_sents, dists[1], dists[2])
+            s.count(trigrams=len(utps))
+    return utps
+
+# Count the unigrams, bigrams, and trigrams in a list of sentences,
+# up to max_order, in one pass over the sentences.
+# Bigrams and trigrams are padded as by bi_grams_sent and tri_grams_sent.
+# Returns the number of sentences and a list of FreqDists,
+# [ unigram counts, bigram counts, trigram counts ].
+def count_ngrams_sents(sents, max_order=3):
+    from collections import Counter
+    from nltk import FreqDist
+    with stage("count_ngrams_sents") as s:
+        counts = [ Counter() for n in range(max_order) ]
+        n_sents = 0
+        for sent in sents:
+            n_sents += 1
+            if len(sent) == 0:
+                continue
+            words = ['', ''] + list(sent) + ['', '']
+            counts[0].update(sent)
+            if max_order > 1:
+                counts[1].update(zip(words[1:-2], words[2:-1]))
+            if max_order > 2:
+                counts[2].update(zip(words, words[1:], words[2:]))
+        dists = [ FreqDist(count) for count in counts ]
+        if s:
+            s.count(sentences=n_sents, tokens=dists[0].N(),
+                    unique=[ len(dist) for dist in dists ],
+                    nc_bins=[ len(set(dist.values())) for dist in dists ])
+    return n_sents, dists
+
+# Unsmoothed unigram probabilities from unigram counts
+def unigram_probabilities(UG_dist):
+    N = UG_dist.N()
+    return { gram : count / N for gram, count in UG_dist.items() }
+
+# Unsmoothed bigram probabilities from unigram and bigram counts.
+# The start of sentence word '' occurs once per sentence.
+def bigram_probabilities(n_sents, UG_dist, BG_dist):
     pgrams = {}
-    for iGram in range(len(N3grams)):
-        N3gram = N3grams[iGram]
+    for gram, count_gram in BG_dist.items():
+        if gram[0] == '':
+            count_word_0 = n_sents
+        else:
+            count_word_0 = UG_dist[gram[0]]
+        pgrams[gram] = count_gram / count_word_0
+    return pgrams
+
+# Unsmoothed trigram probabilities from bigram and trigram counts.
+# The start of sentence bigram ('', '') occurs once per sentence.
+def trigram_probabilities(n_sents, BG_dist, TG_dist):
+    pgrams = {}
+    for N3gram, count_N3gram in TG_dist.items():
         N2gram = N3gram[:2]
-        count_N2gram = dist_N2[N2gram]
-        count_N3gram = dist_N3[N3gram]
-        try:
-            pgram = count_N3gram / count_N2gram
-            pgrams[N3gram] = pgram
-        except ZeroDivisionError:
-            print("Zero count for bigram: ", N2gram)
+        if N2gram == ('', ''):
+            count_N2gram = n_sents
+        else:
+            count_N2gram = BG_dist[N2gram]
+        pgrams[N3gram] = count_N3gram / count_N2gram
     return pgrams
 
+# Compute unsmoothed unigram, bigram, and trigram probabilities
+# from a list of sentences, counting them all in one pass.
+# Returns ( uups, ubps, utps ).
+def unsmoothed_ngrams_sents(sents):
+    n_sents, dists = count_ngrams_sents(sents, 3)
+    UG_dist, BG_dist, TG_dist = dists
+    uups = unigram_probabilities(UG_dist)
+    ubps = bigram_probabilities(n_sents, UG_dist, BG_dist)
+    utps = trigram_probabilities(n_sents, BG_dist, TG_dist)
+    return uups, ubps, utps
+
 # trigrams beginning with particular bigram, from trigrams
 def tri_grams_starting(trigrams, bigram):
     return [ trigram for trigram in trigrams
@@ -182,17 +224,17 @@ def cummulative_probabilities(utps):
 # so that each ngram has its own probability of being chosen
 def choose_by_probability(utcps):
     from random import uniform
-    cummulative_probability = utcps[-1][1]
-    r = uniform(0.0, cummulative_probability)
-    print("Random value, r:", r)
-    entry = None
-    for i in range(len(utcps)):
-        entry = utcps[i]
-        prob = entry[1];
-        if i < 10:
-            print("---", entry, prob)
-        if r <= prob:
-            break
+    with stage("choose_by_probability") as s:
+        cummulative_probability = utcps[-1][1]
+        r = uniform(0.0, cummulative_probability)
+        entry = None
+        for i in range(len(utcps)):
+            entry = utcps[i]
+            prob = entry[1];
+            if r <= prob:
+                break
+        if s:
+            s.count(r=r, entries=len(utcps), probes=i + 1)
     return entry
 
 # choose an Ngram at random from a list of (Ngram, cummulative probability)
@@ -200,26 +242,37 @@ def choose_by_probability(utcps):
 # Use binary search.
 def choose_by_probability_bin_search(utcps):
     from random import uniform
-    cummulative_probability = utcps[-1][1]
-    r = uniform(0.0, cummulative_probability)
-    print("Random value, r:", r, ", Trigram list size:", len(utcps))
-    entry = None
-    first = 0
-    last = len(utcps) - 1
-    found = False
-    while first < last:     # while interval size > 1
-        i = (first + last) // 2
-        entry = utcps[i]
-        prob = entry[1];
-        if i < 20:
-            print("---", first, i, last, ":", entry, prob)
-        if r < prob:
-            last = i        # in this or earlier interval
-        else:
-            first = i + 1   # in later interval
-        
+    with stage("choose_by_probability_bin_search") as s:
+        cummulative_probability = utcps[-1][1]
+        r = uniform(0.0, cummulative_probability)
+        entry = None
+        first = 0
+        last = len(utcps) - 1
+        probes = 0
+        while first < last:     # while interval size > 1
+            i = (first + last) // 2
+            entry = utcps[i]
+            prob = entry[1];
+            probes += 1
+            if r < prob:
+                last = i        # in this or earlier interval
+            else:
+                first = i + 1   # in later interval
+        if s:
+            s.count(r=r, entries=len(utcps), probes=probes)
     return utcps[last]
 
+# choose n Ngrams at random from a list of (Ngram, cummulative probability)
+# or a dictionary { Ngram : probability }, using an alias table:
+# O(1) per Ngram chosen, no console output.
+def choose_by_alias(ngrams, n=1, seed=None):
+    from nlp_book_alias_sampler import AliasSampler
+    if isinstance(ngrams, dict):
+        sampler = AliasSampler(ngrams, seed=seed)
+    else:
+        sampler = AliasSampler.from_cummulative(ngrams, seed=seed)
+    return sampler.sample(n)
+
 # Test
 def test():
     sents = [[], ["One"], ["One", "."], ["One", "two", "."],
@@ -240,18 +293,12 @@ def problem_4_2(filename):
     from nltk.corpus import gutenberg
     words = gutenberg.words(filename)
     sents = gutenberg.sents(filename)
-    UG_dist = FreqDist(words)
-    UG_dist.most_common(n=50)
-    bigrams = bi_grams_sents(sents)
-    BG_dist = FreqDist(bigrams)
-    BG_dist.most_common(n=50)
-    emma_trigrams = tri_grams_sents(sents)
-    TG_dist = FreqDist(trigrams)
-    TG_dist.most_common(n=50)
-    uups = unsmoothed_unigrams_sents(sents)
-    ubps = unsmoothed_bigrams_sents(sents)
-    utps = unsmoothed_trigrams_sents(sents)
-    ssts = tri_grams_sent_starts(trigrams)
+    n_sents, dists = count_ngrams_sents(sents)
+    UG_dist, BG_dist, TG_dist = dists
+    uups = unigram_probabilities(UG_dist)
+    ubps = bigram_probabilities(n_sents, UG_dist, BG_dist)
+    utps = trigram_probabilities(n_sents, BG_dist, TG_dist)
+    ssts = tri_grams_sent_starts(TG_dist.keys())
     sstps = { gram : utps[gram] for gram in ssts }
     print("---- from ", filename, " ----")
     print("Count words:",
@@ -286,64 +333,58 @@ def problem_4_3():
 # problem_4_3()
 
 # Problem 4.4
-def problem_4_4_(filename):
+# Generate a random sentence from the trigrams in a text.
+# The generator indexes the trigrams by their bigram context,
+# so build it once per text and pass it in for each sentence,
+# with a SentenceWriter open for the whole run.
+# verbose: 0 silent, 1 print each sentence, 2 also each word chosen.
+def problem_4_4_(filename, generator=None, writer=None, seed=None,
+                 verbose=1):
+    if generator == None:
+        generator = trigram_generator(filename)
+    if verbose >= 1:
+        print("---- from ", filename, " ----")
+    # choose words until a sentence ending trigram chosen
+    words, logprob = generator.generate(seed=seed, verbose=verbose)
+    sentence = "".join([ " " + word for word in words ])
+    if verbose >= 1:
+        print(sentence)
+    if writer == None:
+        outFileName = filename+".sentences.txt"
+        with open(outFileName, "a") as outFile:
+            outFile.write(sentence+"\n\n")
+    else:
+        writer.write(sentence, seed, logprob)
+    return sentence
+
+# Trigram sentence generator for a text, built once per text
+def trigram_generator(filename, seed=None):
     from nltk.corpus import gutenberg
-    words = gutenberg.words(filename)
+    from nlp_book_trigram_generator import TrigramGenerator
     sents = gutenberg.sents(filename)
-    UG_dist = FreqDist(words)
-    UG_dist.most_common(n=50)
-    bigrams = bi_grams_sents(sents)
-    BG_dist = FreqDist(bigrams)
-    BG_dist.most_common(n=50)
-    trigrams = tri_grams_sents(sents)
-    TG_dist = FreqDist(trigrams)
-    TG_dist.most_common(n=50)
-    uups = unsmoothed_unigrams_sents(sents)
-    ubps = unsmoothed_bigrams_sents(sents)
-    utps = unsmoothed_trigrams_sents(sents)
-    print("---- from ", filename, " ----")
-    # calculate cummulative probabilities for start words ...
-    # choose words until a sentence ending trigram chosen
-    bigram = ('', '',)   # starting bigram: ('', '')
-    sentence = ''
-    while True:
-        ntgs = tri_grams_starting(trigrams, bigram)     # possible next words
-        ntps = { gram : utps[gram] for gram in ntgs }   # next word probabilities
-        ntcs = cummulative_probabilities(ntps)          # .. cummulative
-        cummulative_probability = ntcs[-1][1]
-        entry = choose_by_probability_bin_search(ntcs)
-        print("Randomly chosen entry:", entry)
-        if entry == None:
-            print("Error: no next word found, r:", r,
-                  " > ", cummulative_probability)
-            break
-        next_word = entry[0][2]
-        print("Chosen next word: ", next_word,
-              ", from entry:", (entry[0], ntps[entry[0]],),
-              "cumm prob:", entry[1])
-        if next_word == '':
-            break
-        sentence += " " + next_word
-        bigram = (entry[0][1], entry[0][2],)    # next bigram
-    print(sentence)
-    outFileName = filename+".sentences.txt"
-    with open(outFileName, "a") as outFile:
-        outFile.write(sentence+"\n\n")
-        outFile.close()
+    return TrigramGenerator.from_sents(sents, seed=seed)
 
 # Add timestamp to output file
 def add_timestamp(outFileName):
-    from datetime import datetime
+    from nlp_book_trigram_generator import timestamp_line
     with open(outFileName, "a") as outFile:
-        nowStr = datetime.now().strftime("%B %d, %Y %I:%M:%S %p")
-        timestampLine = "====" + nowStr + "====\n\n"
-        outFile.write(timestampLine)
-        outFile.close()
+        outFile.write(timestamp_line())
 
-# Problem 4.4 - Generate random sentences from trigrams
-def problem_4_4():
+# Problem 4.4 - Generate random sentences from trigrams.
+# Each run appends to <title>.sentences.txt through one buffered writer,
+# and with jsonl=True also writes <title>.sentences.jsonl records of
+# sentence, seed, and log probability.  Each sentence gets its own
+# seed, drawn from the run's seed, so any sentence can be regenerated.
+def problem_4_4(count=10, seed=None, jsonl=False, verbose=1):
+    from random import Random
+    from nlp_book_trigram_generator import SentenceWriter
     texts = [ 'carroll-alice.txt', 'austen-emma.txt' ]
+    seeds = Random(seed)
     for title in texts:
-        add_timestamp(title + ".sentences.txt")
-        for i in range(10):
-            problem_4_4_(title)
+        generator = trigram_generator(title)
+        jsonl_filename = title + ".sentences.jsonl" if jsonl else None
+        with SentenceWriter(title + ".sentences.txt",
+                            jsonl_filename) as writer:
+            for i in range(count):
+                problem_4_4_(title, generator, writer,
+                             seeds.getrandbits(32), verbose)
@@ -0,0 +1,153 @@
+"""
+Count N-grams in parallel across Gutenberg texts or large text files.
+
+Each worker in a process pool counts one Gutenberg fileid, or one
+byte range of a plain text file cut where a whole-file read cuts it
+into blocks, into an NgramStore
+shard.  The shards, small packed arrays plus their vocabularies, are
+merged in input order into global unigram, bigram, and trigram counts,
+identical to counting the whole input serially.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+from nlp_book_corpus_reader import (MAX_BLOCK, MmapCorpusReader,
+                                    punkt_sent_tokenize, text_ranges)
+from nlp_book_ngram_store import NgramStore, merge_stores
+
+# Worker: count a Gutenberg text
+def count_fileid(fileid, max_order=3):
+    """
+    Count the N-grams of a Gutenberg text into a shard.
+    """
+    from nltk.corpus import gutenberg
+    return NgramStore.from_sents(gutenberg.sents(fileid), max_order)
+
+# Worker: count a byte range of a text file
+def count_text_range(filename, start, end, max_order=3, encoding='utf-8',
+                     sent_tokenize=punkt_sent_tokenize, max_block=MAX_BLOCK):
+    """
+    Count the N-grams of part of a plain text file into a shard.
+    """
+    reader = MmapCorpusReader(filename, encoding, sent_tokenize, max_block)
+    return NgramStore.from_sents(reader.sents(start, end), max_order)
+
+# Count tasks for the inputs: ( function, arguments ) each
+def count_tasks(fileids=(), filenames=(), max_order=3, ranges_per_file=1,
+                sent_tokenize=punkt_sent_tokenize, max_block=MAX_BLOCK):
+    tasks = [ (count_fileid, (fileid, max_order)) for fileid in fileids ]
+    for filename in filenames:
+        for start, end in text_ranges(filename, ranges_per_file, max_block):
+            tasks.append((count_text_range,
+                          (filename, start, end, max_order, 'utf-8',
+                           sent_tokenize, max_block)))
+    return tasks
+
+# Count in a process pool
+def parallel_counts(fileids=(), filenames=(), max_order=3,
+                    max_workers=None, ranges_per_file=None,
+                    sent_tokenize=punkt_sent_tokenize, max_block=MAX_BLOCK):
+    """
+    Count the N-grams of Gutenberg fileids and plain text files
+    in a process pool, and merge the shards.  Large text files are
+    split into ranges_per_file ranges (default: one per worker).
+    sent_tokenize must be a module level function, to be pickled.
+    """
+    import os
+    if ranges_per_file is None:
+        ranges_per_file = max_workers or os.cpu_count() or 1
+    tasks = count_tasks(fileids, filenames, max_order, ranges_per_file,
+                        sent_tokenize, max_block)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [ executor.submit(function, *args)
+                    for function, args in tasks ]
+        shards = [ future.result() for future in futures ]
+    return merge_stores(shards)
+
+# Count serially, the same way
+def serial_counts(fileids=(), filenames=(), max_order=3,
+                  sent_tokenize=punkt_sent_tokenize, max_block=MAX_BLOCK):
+    """
+    Count the N-grams of Gutenberg fileids and plain text files
+    in this process.
+    """
+    tasks = count_tasks(fileids, filenames, max_order, 1,
+                        sent_tokenize, max_block)
+    return merge_stores([ function(*args) for function, args in tasks ])
+
+# Global counts as FreqDists, as in nltk_init_emma:
+# ( UG_dist, BG_dist, TG_dist, TG_counts_dist )
+def count_dists(store):
+    """
+    Return the unigram, bigram, and trigram counts, and the
+    trigram counts of counts, as NLTK FreqDists.
+    """
+    from nltk import FreqDist
+    r, n_r = store.counts_of_counts(3)
+    TG_counts_dist = FreqDist(dict(zip(r.tolist(), n_r.tolist())))
+    return (store.freq_dist(1), store.freq_dist(2), store.freq_dist(3),
+            TG_counts_dist)
+
+# ------------------------------------------------------------------------
+# Tests ---
+# ------------------------------------------------------------------------
+
+if __name__ == '__main__':
+
+    import os
+    import random
+    import tempfile
+    import textwrap
+    from nlp_book_corpus_reader import simple_sent_tokenize
+
+    # Counts identical to the serial counts
+    def assert_same(parallel, serial):
+        assert parallel.n_sents == serial.n_sents
+        assert parallel.vocab.words == serial.vocab.words
+        for n in range(1, 4):
+            assert (parallel.table(n)[0] == serial.table(n)[0]).all()
+            assert (parallel.table(n)[1] == serial.table(n)[1]).all()
+
+    # hard-wrapped prose, sentences running across lines, no blank lines
+    rng = random.Random(8)
+    words = [ "the", "cat", "sat", "on", "a", "mat", "and", "dog", "ran",
+              "far", "away", "from", "home", "while", "it", "rained" ]
+    sentences = [ " ".join(rng.choice(words)
+                           for i in range(rng.randint(3, 25))).capitalize()
+                  + rng.choice(".!?") for i in range(3000) ]
+    text = "\n".join(textwrap.wrap(" ".join(sentences), 70)) + "\n"
+    fd, filename = tempfile.mkstemp(suffix=".txt")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+        # small blocks also cut sentences at line breaks, the same
+        # way for the serial and parallel counts
+        for max_block in [ 150, 1000, 4096, MAX_BLOCK ]:
+            serial = serial_counts(filenames=[ filename ],
+                                   sent_tokenize=simple_sent_tokenize,
+                                   max_block=max_block)
+            assert serial.n_sents >= len(sentences)
+            for ranges_per_file in [ 2, 3, 7 ]:
+                parallel = parallel_counts(filenames=[ filename ],
+                                           max_workers=2,
+                                           ranges_per_file=ranges_per_file,
+                                           sent_tokenize=simple_sent_tokenize,
+                                           max_block=max_block)
+                assert_same(parallel, serial)
+        assert serial.n_sents == len(sentences)
+        print(serial.n_sents, serial.size(3), serial.total(3))
+    finally:
+        os.remove(filename)
+
+    # Gutenberg texts, where the corpus is installed
+    from nltk.corpus import gutenberg
+    try:
+        fileids = gutenberg.fileids()
+    except LookupError:
+        fileids = None
+    if fileids:
+        parallel = parallel_counts(fileids)
+        serial = serial_counts(fileids)
+        assert_same(parallel, serial)
+        for n in range(1, 4):
+            print(n, parallel.size(n), parallel.total(n))
@@ -0,0 +1,197 @@
+"""
+Reproducible random sentence generation across a process pool.
+
+Sentence i is generated with its own random stream,
+
+    numpy.random.SeedSequence(seed, spawn_key=(i,))
+
+so the sentences depend only on the master seed and their index, never
+on how they are split into blocks or spread over workers: any number of
+workers gives the same sentences, in the same order.  Without a seed,
+one fresh master seed is drawn for the whole run.
+
+Workers read the trigram keys and the running totals of their counts
+from a model file (save_model()), which each worker process memory maps
+once; the arrays are shared through the page cache, nothing is copied
+per worker, and only a file name is sent with each task.
+Words are chosen with unsmoothed trigram probabilities, as by
+TrigramGenerator.
+"""
+
+import numpy as np
+
+from nlp_book_ngram_store import PAD_ID
+
+class StoreSampler:
+    """
+    Choose next words from the trigram counts of an NgramStore.
+    """
+
+    # The constructor takes the store, e.g. load_model(filename).store,
+    # and the running totals of its trigram counts, e.g. the model
+    # file's, computed here if not given.
+    def __init__(self, store, cumulative=None):
+        """
+        Trigram keys are sorted, so each context's trigrams are one run
+        of them, and its counts one run of the running totals.
+        """
+        self.bits = store.bits
+        self.mask = (1 << store.bits) - 1
+        self.keys, counts = store.table(3)
+        if cumulative is None:
+            cumulative = np.cumsum(counts, dtype=np.int64)
+        self.cumulative = cumulative
+        self.words = store.vocab.words
+
+    # Choose the word following a packed bigram context
+    def choose(self, context, rng):
+        """
+        Return ( word ID, probability ), or ( -1, 0.0 ) if the context
+        was never seen.
+        """
+        lo = int(np.searchsorted(self.keys, context << self.bits))
+        hi = int(np.searchsorted(self.keys, (context + 1) << self.bits))
+        if lo == hi:
+            return -1, 0.0
+        base = int(self.cumulative[lo - 1]) if lo > 0 else 0
+        total = int(self.cumulative[hi - 1]) - base
+        r = base + int(rng.integers(total))
+        i = int(np.searchsorted(self.cumulative, r, side='right'))
+        count = int(self.cumulative[i]) - (int(self.cumulative[i - 1])
+                                           if i > 0 else 0)
+        return int(self.keys[i]) & self.mask, count / total
+
+    # Generate one sentence
+    def generate(self, rng, max_words=200):
+        """
+        Choose words from the start context until the end marker, or
+        until max_words words.  Returns ( words, log probability ).
+        """
+        words = []
+        logprob = 0.0
+        context = (PAD_ID << self.bits) | PAD_ID
+        while len(words) < max_words:
+            word_id, prob = self.choose(context, rng)
+            if word_id < 0:
+                break
+            logprob += np.log(prob)
+            if word_id == PAD_ID:
+                break
+            words.append(self.words[word_id])
+            context = ((context & self.mask) << self.bits) | word_id
+        return words, float(logprob)
+
+# Master seed of a run: the seed given, or fresh entropy if None
+def master_seed(seed):
+    if seed is None:
+        return np.random.SeedSequence().entropy
+    return seed
+
+# Random generator for sentence i of a run
+def sentence_rng(seed, i):
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(i,)))
+
+# Samplers, one per model file, loaded once per process
+_samplers = {}
+
+def get_sampler(model_filename):
+    """
+    Return the StoreSampler for a model file, memory mapping the
+    file on the first call in this process.
+    """
+    sampler = _samplers.get(model_filename)
+    if sampler is None:
+        from nlp_book_model_file import load_model
+        model = load_model(model_filename)
+        cumulative = None
+        if model.store.max_order == 3:
+            cumulative = model.cumulative
+        sampler = StoreSampler(model.store, cumulative)
+        _samplers[model_filename] = sampler
+    return sampler
+
+# Generate sentences start to stop - 1 of a run
+def generate_block(model_filename, seed, start, stop, max_words=200):
+    """
+    Return [ ( words, log probability ) ] for sentences start..stop-1.
+    """
+    sampler = get_sampler(model_filename)
+    return [ sampler.generate(sentence_rng(seed, i), max_words)
+             for i in range(start, stop) ]
+
+# Generate count sentences, in order, across a process pool
+def generate_parallel(model_filename, count, seed, max_workers=None,
+                      block_size=1000, max_words=200):
+    """
+    Yield ( words, log probability ) for count sentences, generated in
+    blocks of block_size across max_workers processes (1: in this
+    process).  The sentences are the same for any max_workers and
+    block_size.  At most two blocks per worker are in flight at a time.
+    With seed None, a fresh master seed is used for all the blocks.
+    """
+    from nlp_book_pool import ordered_results
+    seed = master_seed(seed)
+    tasks = ( (model_filename, seed, start, min(start + block_size, count),
+               max_words) for start in range(0, count, block_size) )
+    for sentences in ordered_results(generate_block, tasks, max_workers):
+        yield from sentences
+
+# Generate sentences into a sentences file
+def generate_file(model_filename, out_filename, count, seed,
+                  max_workers=None, block_size=1000, jsonl_filename=None):
+    """
+    Write count sentences through a SentenceWriter; each JSON record
+    carries the master seed and the sentence index, which together
+    regenerate the sentence (sentence_rng()); with seed None, the
+    fresh master seed drawn for the run.  Returns the master seed.
+    """
+    from nlp_book_trigram_generator import SentenceWriter
+    seed = master_seed(seed)
+    with SentenceWriter(out_filename, jsonl_filename) as writer:
+        for i, (words, logprob) in enumerate(generate_parallel(
+                model_filename, count, seed, max_workers, block_size)):
+            writer.write(" ".join(words), seed, logprob, index=i)
+    return seed
+
+# ------------------------------------------------------------------------
+# Tests ---
+# ------------------------------------------------------------------------
+
+if __name__ == '__main__':
+
+    import os
+    import tempfile
+    import time
+    from nlp_book_bench import zipf_sents
+    from nlp_book_ngram_store import NgramStore
+    from nlp_book_model_file import save_model
+
+    store = NgramStore.from_sents(zipf_sents(200000, vocab_size=2000))
+    filename = os.path.join(tempfile.mkdtemp(), "test.ngmodel")
+    save_model(filename, store, smooth=False)
+    runs = {}
+    for workers, block_size in [ (1, 1000), (2, 300), (4, 1000) ]:
+        start = time.perf_counter()
+        runs[workers] = list(generate_parallel(filename, 4000, 42, workers,
+                                               block_size))
+        print(workers, "workers:", time.perf_counter() - start, "seconds")
+    assert runs[1] == runs[2] == runs[4]
+    # the sampler uses the running totals stored in the model file
+    assert isinstance(get_sampler(filename).cumulative, np.memmap)
+    print(" ".join(runs[1][0][0]), runs[1][0][1])
+    # without a seed, the JSON records carry the one master seed drawn,
+    # which regenerates the run
+    import json
+    out_filename = filename + ".txt"
+    jsonl_filename = filename + ".jsonl"
+    seed = generate_file(filename, out_filename, 50, None, 1, 20,
+                         jsonl_filename)
+    with open(jsonl_filename) as f:
+        records = [ json.loads(line) for line in f ]
+    assert isinstance(seed, int)
+    assert [ record['seed'] for record in records ] == [ seed ] * 50
+    assert [ record['sentence'] for record in records ] \
+        == [ " ".join(words) for words, logprob in
+             generate_parallel(filename, 50, seed, 1, 7) ]
+    for name in [ filename, out_filename, jsonl_filename ]:
+        os.remove(name)
@@ -0,0 +1,57 @@
+"""
+Ordered results of tasks run across a process pool, a bounded number
+in flight.
+
+    for tagged in ordered_results(tag_sentences_PT, batches, workers):
+        ...
+
+submits one task per item and yields the results in submission order.
+At most in_flight tasks per worker are submitted ahead of the result
+being yielded, so a long or unbounded stream of tasks, e.g. batches of
+a file being read, is never queued, nor its results held, all at once.
+With one worker the tasks run in this process, without a pool.
+"""
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# Number of worker processes for max_workers (None: one per CPU)
+def worker_count(max_workers=None):
+    return max_workers or os.cpu_count() or 1
+
+# Results of function(*args) for each args of tasks, in order
+def ordered_results(function, tasks, max_workers=None, in_flight=2):
+    """
+    Yield function(*args) for each tuple args in tasks, in order,
+    running them across max_workers processes with at most in_flight
+    tasks per worker pending.  function and its arguments must pickle.
+    """
+    workers = worker_count(max_workers)
+    if workers == 1:
+        for args in tasks:
+            yield function(*args)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for args in tasks:
+            pending.append(executor.submit(function, *args))
+            if len(pending) >= in_flight * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+# ------------------------------------------------------------------------
+# Tests ---
+# ------------------------------------------------------------------------
+
+if __name__ == '__main__':
+
+    from math import factorial
+
+    tasks = [ (n,) for n in range(200) ]
+    expected = [ factorial(n) for n in range(200) ]
+    for workers in [ 1, 2, 3 ]:
+        results = list(ordered_results(factorial, iter(tasks), workers))
+        assert results == expected, workers
+    print("ordered for 1, 2, and 3 workers")
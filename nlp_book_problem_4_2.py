@@ -1,10 +1,19 @@
 # nlp_book_problem_4_2: Compute unsmoothed unigrams, bigrams, and trigrams.
 # Sig Nin 2018-08-08
 
-import nltk
-from nltk.book import *
 from nlp_book_nltk import *
 
+# Moby Dick, text1 of nltk.book, loaded on first use.
+# (nltk.book loads all nine book texts when imported.)
+_text1 = None
+
+def get_text1():
+    global _text1
+    if _text1 is None:
+        from nltk.corpus import gutenberg
+        _text1 = list(gutenberg.words('melville-moby_dick.txt'))
+    return _text1
+
 # From word lists in NLTK book corpora ...
 def get_bigrams(words):
     two_grams = bi_grams(words)
@@ -12,6 +21,7 @@ def get_bigrams(words):
 
 # Solve the problem, incrementally ..
 def main():
+    text1 = get_text1()
     text_1_bigrams = bi_grams(text1) # Moby Dick
     print("Count bigrams in Moby Dick")
     print(len(list(text_1_bigrams)))
@@ -35,4 +45,5 @@ def main():
         print(gram, ":", text_1_p_trigrams[gram])
 
 # Run the program
-main()
+if __name__ == '__main__':
+    main()
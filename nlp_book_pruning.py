@@ -0,0 +1,220 @@
+"""
+Prune a Kneser-Ney trigram model to a size or memory budget.
+
+Each seen trigram h w and bigram v w is ranked by how much dropping it
+would change the model, Stolcke's relative entropy criterion, here with
+the backoff weights held at their unpruned values while ranking:
+
+    delta(h, w) = P(h w) ( log p(w | h) - log( gamma(h) p'(w | h') ) )
+
+where p' is the lower order and P(h w) the relative frequency of h w.
+The trigrams and bigrams with the smallest deltas are dropped until the
+model fits the target size or memory budget, or, with a count cutoff,
+all those seen no more than cutoff times.  Dropped N-grams fall back to
+the lower order, and each context's backoff weight is recomputed so
+that its distribution still sums to one:
+
+    gamma'(h) = ( 1 - sum p(w | h) ) / ( 1 - sum p'(w | h') )
+
+the sums over the words still stored for h.
+"""
+
+import copy
+
+import numpy as np
+
+from nlp_book_kneser_ney import groups, lookup
+
+# Bytes stored per trigram (key, probability, log probability),
+# per bigram (key, probability), and per context (key, backoff weight)
+TRIGRAM_BYTES = 24
+BIGRAM_BYTES = 16
+CONTEXT_BYTES = 16
+
+# Sums over groups of a sorted key array, and the distinct keys
+def group_sums(ctx_keys, values):
+    distinct, starts, sizes = groups(ctx_keys)
+    if len(starts) == 0:
+        return distinct, values[:0]
+    return distinct, np.add.reduceat(values, starts)
+
+# Backoff weights for the contexts of the kept N-grams
+def backoff_weights(ctx_keys, probs, lower_probs):
+    """
+    Return ( contexts, gamma' ) for sorted context keys of the kept
+    N-grams, their probabilities, and their lower order probabilities.
+    """
+    contexts, kept_mass = group_sums(ctx_keys, probs)
+    contexts, lower_mass = group_sums(ctx_keys, lower_probs)
+    denominator = 1.0 - lower_mass
+    gamma = np.where(denominator > 1e-12,
+                     (1.0 - kept_mass) / np.maximum(denominator, 1e-12), 0.0)
+    return contexts, np.maximum(gamma, 0.0)
+
+# Relative entropy increase for dropping each trigram and bigram
+def pruning_deltas(model):
+    """
+    Return ( trigram deltas, bigram deltas ), parallel to model.keys3
+    and model.keys2.
+    """
+    store = model.store
+    bits = store.bits
+    mask = (1 << bits) - 1
+    # trigrams
+    c3 = np.asarray(store.table(3)[1], dtype=float)
+    ctx = lookup(model.ctx3_keys, model.keys3 >> bits)
+    backoff3 = model.gamma3[ctx] * model.p2_of_keys(
+        model.keys3 & ((1 << (2 * bits)) - 1))
+    delta3 = c3 / c3.sum() * (model.logp3 - np.log(backoff3))
+    # bigrams, weighted by their relative frequency
+    c2 = store.counts_of(model.keys2, 2).astype(float)
+    c2 = np.maximum(c2, 1.0)
+    ctx = lookup(model.ctx2_keys, model.keys2 >> bits)
+    backoff2 = model.gamma2[ctx] * model.p1[model.keys2 & mask]
+    delta2 = c2 / c2.sum() * (np.log(model.p2) - np.log(backoff2))
+    return delta3, delta2
+
+# Choose the N-grams to keep
+def choose_kept(model, target_size=None, memory_budget=None, cutoff=None):
+    """
+    Return boolean masks ( keep trigrams, keep bigrams ).
+    target_size is the number of trigrams and bigrams to keep,
+    memory_budget the bytes for the whole pruned model, as counted by
+    model_bytes(), and cutoff the count at or below which they are
+    dropped; pad-only N-grams, such as the ('', '') bigram after a
+    sentence's last word, are not in the store's counts and are kept.
+    Under a memory budget, the first N-gram kept in a context
+    also pays for the context's key and backoff weight, and P1, kept
+    whole, is paid for first.
+    """
+    store = model.store
+    if cutoff is not None:
+        # a pad-only N-gram has every word ID 0, so its key is 0
+        keep3 = (store.table(3)[1] > cutoff) | (model.keys3 == 0)
+        keep2 = (store.counts_of(model.keys2, 2) > cutoff) \
+            | (model.keys2 == 0)
+        return np.asarray(keep3), keep2
+    delta3, delta2 = pruning_deltas(model)
+    deltas = np.concatenate((delta3, delta2))
+    costs = np.concatenate((np.full(len(delta3), TRIGRAM_BYTES),
+                            np.full(len(delta2), BIGRAM_BYTES)))
+    order = np.argsort(-deltas, kind='stable')
+    keep = np.zeros(len(deltas), dtype=bool)
+    if target_size is not None:
+        keep[order[:target_size]] = True
+    elif memory_budget is not None:
+        available = memory_budget - model.p1.nbytes
+        if available < 0:
+            raise ValueError("choose_kept: memory budget of "
+                             + str(memory_budget) + " bytes is below the "
+                             + str(model.p1.nbytes) + " bytes of P1")
+        # contexts, trigram and bigram ones told apart by the low bit
+        bits = store.bits
+        contexts = np.concatenate(((model.keys3 >> bits) * 2 + 1,
+                                   (model.keys2 >> bits) * 2))[order]
+        distinct, first = np.unique(contexts, return_index=True)
+        ranked_costs = costs[order]
+        ranked_costs[first] += CONTEXT_BYTES
+        n_keep = np.searchsorted(np.cumsum(ranked_costs), available,
+                                 side='right')
+        keep[order[:n_keep]] = True
+    else:
+        raise ValueError("choose_kept: give a target_size, "
+                         "memory_budget, or cutoff")
+    return keep[:len(delta3)], keep[len(delta3):]
+
+# Prune a Kneser-Ney model
+def prune_model(model, target_size=None, memory_budget=None, cutoff=None):
+    """
+    Return a pruned copy of a KneserNeyTrigramModel, renormalized.
+    """
+    bits = model.store.bits
+    mask = (1 << bits) - 1
+    keep3, keep2 = choose_kept(model, target_size, memory_budget, cutoff)
+    pruned = copy.copy(model)
+    # bigrams, backing off to P1
+    pruned.keys2 = model.keys2[keep2]
+    pruned.p2 = model.p2[keep2]
+    pruned.ctx2_keys, pruned.gamma2 = backoff_weights(
+        pruned.keys2 >> bits, pruned.p2, model.p1[pruned.keys2 & mask])
+    # trigrams, backing off to the pruned P2
+    pruned.keys3 = model.keys3[keep3]
+    pruned.p3 = model.p3[keep3]
+    pruned.logp3 = model.logp3[keep3]
+    lower = pruned.p2_of_keys(pruned.keys3 & ((1 << (2 * bits)) - 1))
+    pruned.ctx3_keys, pruned.gamma3 = backoff_weights(
+        pruned.keys3 >> bits, pruned.p3, lower)
+    return pruned
+
+# Bytes in a model's N-gram and context arrays
+def model_bytes(model):
+    return sum([ a.nbytes for a in [ model.keys3, model.p3, model.logp3,
+                                     model.ctx3_keys, model.gamma3,
+                                     model.keys2, model.p2,
+                                     model.ctx2_keys, model.gamma2,
+                                     model.p1 ] ])
+
+# Prune, and report the change in size and perplexity
+def prune_report(model, sents, target_size=None, memory_budget=None,
+                 cutoff=None, unseen_logprob=np.log(1e-7)):
+    """
+    Prune a model and return ( pruned model, report ), the report a
+    dictionary of N-gram counts, bytes, and perplexity on sents
+    (held-out sentences) before and after pruning.  Words not in the
+    vocabulary get unseen_logprob in both.
+    """
+    from nlp_book_scoring import TrigramScorer
+    pruned = prune_model(model, target_size, memory_budget, cutoff)
+    sents = [ list(sent) for sent in sents ]
+    before = TrigramScorer(model.store, unseen_logprob,
+                           model=model).perplexity(sents)
+    after = TrigramScorer(pruned.store, unseen_logprob,
+                          model=pruned).perplexity(sents)
+    report = { 'trigrams' : (len(model.keys3), len(pruned.keys3)),
+               'bigrams' : (len(model.keys2), len(pruned.keys2)),
+               'bytes' : (model_bytes(model), model_bytes(pruned)),
+               'perplexity' : (before, after),
+               'perplexity_change' : after / before - 1.0 }
+    return pruned, report
+
+# ------------------------------------------------------------------------
+# Tests ---
+# ------------------------------------------------------------------------
+
+if __name__ == '__main__':
+
+    from nlp_book_bench import zipf_sents
+    from nlp_book_ngram_store import NgramStore
+    from nlp_book_kneser_ney import KneserNeyTrigramModel
+
+    sents = zipf_sents(100000, vocab_size=2000)
+    train, test = sents[:-500], sents[-500:]
+    model = KneserNeyTrigramModel(NgramStore.from_sents(train))
+    for target in [ None, 50000, 20000 ]:
+        if target is None:
+            pruned, report = prune_report(model, test, cutoff=1)
+        else:
+            pruned, report = prune_report(model, test, target_size=target)
+        print(report)
+        if target is not None:
+            assert len(pruned.keys3) + len(pruned.keys2) == target
+        words = model.store.vocab.words
+        # the pruned distributions still sum to one
+        for context in [ ('', ''), (words[1], words[2]) ]:
+            total = pruned.cond_probs(context).sum()
+            assert abs(total - 1.0) < 1e-9, (context, total)
+    # cutoff pruning keeps the ('', '') bigram, so the sentence-final
+    # contexts ( w, '' ) still normalize, and still end the sentence
+    pruned = prune_model(model, cutoff=1)
+    assert 0 in pruned.keys2.tolist()
+    assert pruned.p2_of_keys([ 0 ])[0] == model.p2_of_keys([ 0 ])[0]
+    for word in model.store.vocab.words[1:20]:
+        before = model.cond_probs((word, ''))
+        after = pruned.cond_probs((word, ''))
+        assert abs(after.sum() - 1.0) < 1e-9, (word, after.sum())
+        assert after.argmax() == 0, (word, before[0], after[0])
+    # a memory budget holds for the whole pruned model
+    for budget in [ 300000, 1000000 ]:
+        pruned = prune_model(model, memory_budget=budget)
+        assert model_bytes(pruned) <= budget
+        assert abs(pruned.cond_probs(('', '')).sum() - 1.0) < 1e-9
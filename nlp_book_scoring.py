@@ -0,0 +1,152 @@
+"""
+Batched trigram log-probability and perplexity scoring.
+
+A batch of sentences is converted to word IDs, joined into one padded
+ID stream (the '' padding of tri_grams_sent()), cut into packed trigram
+keys, and the log-probabilities of all its trigrams are gathered at once
+with a binary search into a table precomputed from an NgramStore.
+Per-sentence log-likelihoods are then summed with np.bincount.
+
+Each sentence of n words makes n+1 predictions: its words and the end
+marker ''.  Its last trigram, ( <last word>, '', '' ), always has
+probability 1 and is not counted.
+"""
+
+import numpy as np
+
+from nlp_book_ngram_store import padded_stream, window_keys
+
+class TrigramScorer:
+    """
+    Score sentences with the trigram probabilities of an NgramStore.
+    """
+
+    # The constructor takes an NgramStore, e.g. from
+    # NgramStore.from_sents() or load_model().store.
+    # Trigrams never seen, or with unknown words, get unseen_logprob:
+    # -inf for unsmoothed MLE, or a floor such as log(1e-7).
+    # A smoothed model, e.g. KneserNeyTrigramModel, can be given to
+    # score with its logprobs_of_keys() instead of unsmoothed MLE.
+    def __init__(self, store, unseen_logprob=-np.inf, model=None):
+        """
+        Precompute the log-probability of every trigram in the store.
+        """
+        self.store = store
+        self.unseen_logprob = unseen_logprob
+        self.model = model
+        keys, counts = store.table(3)
+        self.keys = keys
+        if model is None:
+            self.logprobs = np.log(counts / store.context_counts(keys, 3))
+
+    # Log-probabilities for packed trigram keys
+    def logprobs_of_keys(self, keys):
+        """
+        Gather the log-probabilities of an array of trigram keys.
+        """
+        if self.model is not None:
+            return self.model.logprobs_of_keys(keys)
+        logprobs = np.full(keys.shape, self.unseen_logprob, dtype=float)
+        if len(self.keys) == 0:
+            return logprobs
+        i = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        found = self.keys[i] == keys
+        logprobs[found] = self.logprobs[i[found]]
+        return logprobs
+
+    # Trigram keys for a batch of sentences
+    def batch_keys(self, sents):
+        """
+        Return ( keys, sentence index, known ) for every trigram of
+        the sentences but the last of each, and the sentence lengths.
+        known is False for trigrams with a word not in the vocabulary.
+        """
+        vocab = self.store.vocab
+        lengths = np.array([ len(sent) for sent in sents ], dtype=np.int64)
+        nonempty = lengths > 0
+        words = [ word for sent in sents for word in sent ]
+        ids = vocab.ids(words, add=False).astype(np.int64)
+        stream = padded_stream(ids, lengths[nonempty], 3)
+        unknown = stream < 0
+        stream[unknown] = 0
+        keys = window_keys(stream, 3, self.store.bits)
+        known = ~(unknown[:-2] | unknown[1:-1] | unknown[2:])
+        # windows come in blocks of len+2 per non-empty sentence
+        block = lengths[nonempty] + 2
+        sent_index = np.repeat(np.flatnonzero(nonempty), block)
+        last = np.cumsum(block) - 1
+        scored = np.ones(len(keys), dtype=bool)
+        scored[last] = False
+        return keys[scored], sent_index[scored], known[scored], lengths
+
+    # Log-likelihood of each sentence in a batch
+    def score(self, sents):
+        """
+        Return ( log-likelihoods, predictions ): for each sentence,
+        the natural log of its probability and its number of
+        predictions (words + 1, 0 for an empty sentence).
+        """
+        sents = [ list(sent) for sent in sents ]
+        keys, sent_index, known, lengths = self.batch_keys(sents)
+        logprobs = self.logprobs_of_keys(keys)
+        logprobs[~known] = self.unseen_logprob
+        loglik = np.bincount(sent_index, weights=logprobs,
+                             minlength=len(sents))
+        predictions = np.where(lengths > 0, lengths + 1, 0)
+        return loglik, predictions
+
+    # Score a long list of sentences in batches
+    def score_batches(self, sents, batch_size=10000):
+        """
+        Generate ( log-likelihoods, predictions ) for each batch
+        of batch_size sentences.
+        """
+        batch = []
+        for sent in sents:
+            batch.append(sent)
+            if len(batch) == batch_size:
+                yield self.score(batch)
+                batch = []
+        if batch:
+            yield self.score(batch)
+
+    # Perplexity of a corpus
+    def perplexity(self, sents, batch_size=10000):
+        """
+        Return exp( - total log-likelihood / total predictions ).
+        """
+        total_loglik = 0.0
+        total_predictions = 0
+        for loglik, predictions in self.score_batches(sents, batch_size):
+            total_loglik += loglik.sum()
+            total_predictions += predictions.sum()
+        if total_predictions == 0:
+            return float('nan')
+        return float(np.exp(-total_loglik / total_predictions))
+
+# ------------------------------------------------------------------------
+# Tests ---
+# ------------------------------------------------------------------------
+
+if __name__ == '__main__':
+
+    from math import log
+    from nlp_book_ngram_store import NgramStore
+    from nlp_book_nltk import tri_grams_sent
+
+    sents = [["One"], ["One", "."], ["One", "two", "."],
+             ['This', 'is', 'a', 'short', 'test', '.'],
+             ['This', 'is', 'a', 'test', '.'] ]
+    store = NgramStore.from_sents(sents)
+    scorer = TrigramScorer(store, unseen_logprob=log(1e-7))
+    utps = store.unsmoothed_trigrams()
+    batch = sents + [[], ['This', 'is', 'unknown', '.']]
+    loglik, predictions = scorer.score(batch)
+    for sent, ll, n in zip(batch, loglik, predictions):
+        expected = sum([ log(utps.get(gram, 1e-7))
+                         for gram in tri_grams_sent(sent)[:-1] ])
+        assert abs(ll - expected) < 1e-9, (sent, ll, expected)
+        assert n == (len(sent) + 1 if sent else 0)
+    perplexity = scorer.perplexity(sents)
+    assert perplexity > 1.0
+    print("perplexity:", perplexity)
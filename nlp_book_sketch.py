@@ -0,0 +1,338 @@
+"""
+Approximate N-gram counting in fixed memory.
+
+A Count-Min sketch (Cormode and Muthukrishnan) keeps depth rows of width
+counters; each N-gram adds to one counter per row, chosen by a hash, and
+its count is estimated by the smallest of its counters.  Estimates never
+fall below the true count, and with
+
+    width = e / epsilon,  depth = ln(1 / delta)
+
+they exceed it by more than epsilon N (N the total count) with
+probability at most delta.  With conservative update, an N-gram only
+raises its counters as far as its new estimate, which keeps the
+overestimates of rare N-grams much smaller.
+
+A Space-Saving summary (Metwally, Agrawal, and El Abbadi) monitors k
+N-grams: a new N-gram replaces the one with the smallest count and
+inherits that count as its error.  Every N-gram seen more than N / k
+times is monitored, so the most common N-grams come from the summary
+without an exact table or a full sort.
+
+ApproxFreqDist combines the two behind part of the FreqDist interface:
+update(), [ngram], freq(), N(), and most_common().
+"""
+
+import heapq
+from collections import Counter
+from hashlib import blake2b
+from math import ceil, e, log
+
+import numpy as np
+
+# 64-bit hash of an N-gram, the same in every process
+def stable_hash(ngram):
+    """
+    Return a 64-bit hash of a word, an N-gram tuple of words, or an
+    integer key (e.g. a packed key from NgramStore.key()).
+    """
+    if isinstance(ngram, (int, np.integer)):
+        data = int(ngram).to_bytes(8, 'little', signed=True)
+    elif isinstance(ngram, tuple):
+        data = "\x1f".join(ngram).encode('utf-8')
+    else:
+        data = str(ngram).encode('utf-8')
+    return int.from_bytes(blake2b(data, digest_size=8).digest(), 'little')
+
+class CountMinSketch:
+    """
+    Approximate counts in depth x width counters.
+    """
+
+    # The constructor takes the table size; width is rounded up to a
+    # power of two, for multiply-shift hashing.
+    def __init__(self, width=2 ** 16, depth=5, conservative=True, seed=0):
+        """
+        Allocate the counters and draw the row hash multipliers.
+        """
+        self.bits = max(1, int(ceil(log(max(width, 2), 2))))
+        self.width = 1 << self.bits
+        self.depth = depth
+        self.conservative = conservative
+        self.table = np.zeros((depth, self.width), dtype=np.int64)
+        rng = np.random.default_rng(seed)
+        # odd 64-bit multipliers
+        self.multipliers = (rng.integers(0, 2 ** 63, size=depth,
+                                         dtype=np.uint64) * np.uint64(2)
+                            + np.uint64(1))
+        self.total = 0
+
+    # Size the sketch for an error bound
+    @classmethod
+    def from_error(cls, epsilon=1e-4, delta=1e-3, conservative=True, seed=0):
+        """
+        Return a sketch whose estimates exceed the true count by more
+        than epsilon N with probability at most delta.
+        """
+        width = int(ceil(e / epsilon))
+        depth = max(1, int(ceil(log(1.0 / delta))))
+        return cls(width, depth, conservative, seed)
+
+    # Counter columns for 64-bit hashes, one row per hash function
+    def columns(self, hashes):
+        """
+        Return a depth x len(hashes) array of column indexes.
+        """
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        products = self.multipliers[:, None] * hashes[None, :]
+        return (products >> np.uint64(64 - self.bits)).astype(np.int64)
+
+    # Add counts for hashed N-grams
+    def add_hashes(self, hashes, counts):
+        """
+        Add counts[i] to the N-gram with hash hashes[i].
+        """
+        counts = np.asarray(counts, dtype=np.int64)
+        cols = self.columns(hashes)
+        self.total += int(counts.sum())
+        if not self.conservative:
+            for row in range(self.depth):
+                np.add.at(self.table[row], cols[row], counts)
+            return
+        # conservative update: raise each counter only to the new estimate
+        rows = np.arange(self.depth)
+        table = self.table
+        for j, count in enumerate(counts.tolist()):
+            col = cols[:, j]
+            cells = table[rows, col]
+            table[rows, col] = np.maximum(cells, cells.min() + count)
+
+    # Add counts for N-grams
+    def update(self, counts):
+        """
+        Add a dictionary or Counter { ngram : count }.
+        """
+        if len(counts) == 0:
+            return
+        hashes = [ stable_hash(ngram) for ngram in counts ]
+        self.add_hashes(hashes, list(counts.values()))
+
+    # Estimated counts for hashed N-grams
+    def estimate_hashes(self, hashes):
+        cols = self.columns(hashes)
+        return self.table[np.arange(self.depth)[:, None], cols].min(axis=0)
+
+    # Estimated count of an N-gram
+    def estimate(self, ngram):
+        return int(self.estimate_hashes([ stable_hash(ngram) ])[0])
+
+    # Bound on the overestimate, epsilon N, holding with probability
+    # 1 - delta for the sketch's width and depth
+    def error_bound(self):
+        return e / self.width * self.total
+
+    # Bytes of counters
+    def nbytes(self):
+        return self.table.nbytes
+
+class SpaceSaving:
+    """
+    The k most common N-grams of a stream, with their count errors.
+    """
+
+    # The constructor takes the number of N-grams to monitor.
+    def __init__(self, k=1000):
+        """
+        Start with no N-grams monitored.
+        """
+        self.k = k
+        self.counts = {}
+        self.errors = {}
+        # ( count, ngram ) for every monitored N-gram; counts only grow,
+        # so an entry's count is a lower bound on the N-gram's count
+        self.heap = []
+        self.total = 0
+
+    # Add a count for an N-gram
+    def add(self, ngram, count=1):
+        """
+        Count an N-gram, replacing the least common N-gram if k are
+        already monitored.
+        """
+        self.total += count
+        if ngram in self.counts:
+            self.counts[ngram] += count
+            return
+        if len(self.counts) < self.k:
+            self.counts[ngram] = count
+            self.errors[ngram] = 0
+            heapq.heappush(self.heap, (count, ngram))
+            return
+        # find the least common N-gram, refreshing stale entries
+        while True:
+            least, victim = self.heap[0]
+            current = self.counts[victim]
+            if current == least:
+                break
+            heapq.heapreplace(self.heap, (current, victim))
+        del self.counts[victim]
+        del self.errors[victim]
+        self.counts[ngram] = least + count
+        self.errors[ngram] = least
+        heapq.heapreplace(self.heap, (least + count, ngram))
+
+    # Add counts for N-grams
+    def update(self, counts):
+        """
+        Add a dictionary or Counter { ngram : count }.
+        """
+        for ngram, count in counts.items():
+            self.add(ngram, count)
+
+    # Monitored N-grams, most common first
+    def most_common(self, n=None):
+        """
+        Return [ ( ngram, count, error ) ], count - error <= true count
+        <= count, most common first.
+        """
+        ranked = sorted(self.counts.items(), key=lambda item: -item[1])
+        return [ (ngram, count, self.errors[ngram])
+                 for ngram, count in ranked[:n] ]
+
+class ApproxFreqDist:
+    """
+    Approximate frequency distribution of an unbounded stream.
+    """
+
+    # The constructor takes the error bound of the counts, and the
+    # number of most common N-grams to track.
+    def __init__(self, epsilon=1e-4, delta=1e-3, k=1000, conservative=True,
+                 seed=0, chunk_size=1 << 16):
+        """
+        Create an empty Count-Min sketch and Space-Saving summary.
+        """
+        self.sketch = CountMinSketch.from_error(epsilon, delta, conservative,
+                                                seed)
+        self.top = SpaceSaving(k)
+        self.chunk_size = chunk_size
+
+    # Count samples, e.g. ngrams_sents(sents, 3)
+    def update(self, samples):
+        """
+        Count an iterable of samples, in chunks of chunk_size: each
+        chunk is first totalled, so a sample repeated in a chunk costs
+        one sketch and summary update.
+        """
+        chunk = Counter()
+        n = 0
+        for sample in samples:
+            chunk[sample] += 1
+            n += 1
+            if n == self.chunk_size:
+                self.add_counts(chunk)
+                chunk = Counter()
+                n = 0
+        self.add_counts(chunk)
+
+    # Add a dictionary or Counter { sample : count }
+    def add_counts(self, counts):
+        self.sketch.update(counts)
+        self.top.update(counts)
+
+    # Estimated count of a sample, never below its true count
+    def __getitem__(self, sample):
+        estimate = self.sketch.estimate(sample)
+        if sample in self.top.counts:
+            estimate = min(estimate, self.top.counts[sample])
+        return estimate
+
+    def get(self, sample, default=0):
+        count = self[sample]
+        return count if count > 0 else default
+
+    # Total count of all samples
+    def N(self):
+        return self.sketch.total
+
+    # Estimated relative frequency of a sample
+    def freq(self, sample):
+        if self.N() == 0:
+            return 0.0
+        return self[sample] / self.N()
+
+    # Most common samples and their estimated counts
+    def most_common(self, n=None):
+        """
+        Return [ ( sample, count ) ], most common first.  Every sample
+        with a true count above N / k is among the k tracked.
+        """
+        ranked = [ (sample, self[sample]) for sample, count, error
+                   in self.top.most_common() ]
+        ranked.sort(key=lambda item: -item[1])
+        return ranked[:n]
+
+    # Bound on the overestimate of a count
+    def error_bound(self):
+        return self.sketch.error_bound()
+
+# Approximate counts of the unigrams, bigrams, and trigrams of sentences,
+# as count_ngrams_sents() but in fixed memory.
+def approx_count_ngrams_sents(sents, max_order=3, **kwargs):
+    """
+    Return the number of sentences and a list of ApproxFreqDists,
+    [ unigram counts, bigram counts, trigram counts ], streaming the
+    sentences once.  kwargs are passed to ApproxFreqDist.
+    """
+    dists = [ ApproxFreqDist(**kwargs) for n in range(max_order) ]
+    chunks = [ Counter() for n in range(max_order) ]
+    n_sents = 0
+    n_words = 0
+    for sent in sents:
+        n_sents += 1
+        if len(sent) == 0:
+            continue
+        n_words += len(sent)
+        words = ['', ''] + list(sent) + ['', '']
+        chunks[0].update(sent)
+        if max_order > 1:
+            chunks[1].update(zip(words[1:-2], words[2:-1]))
+        if max_order > 2:
+            chunks[2].update(zip(words, words[1:], words[2:]))
+        if n_words >= dists[0].chunk_size:
+            for dist, chunk in zip(dists, chunks):
+                dist.add_counts(chunk)
+                chunk.clear()
+            n_words = 0
+    for dist, chunk in zip(dists, chunks):
+        dist.add_counts(chunk)
+    return n_sents, dists
+
+# ------------------------------------------------------------------------
+# Tests ---
+# ------------------------------------------------------------------------
+
+if __name__ == '__main__':
+
+    from nlp_book_bench import zipf_sents
+    from nlp_book_nltk import count_ngrams_sents
+
+    sents = zipf_sents(50000)
+    n_sents, exact = count_ngrams_sents(sents)
+    n_approx, approx = approx_count_ngrams_sents(sents, epsilon=1e-4, k=2000)
+    assert n_approx == n_sents
+    for n in range(3):
+        TG = exact[n]
+        dist = approx[n]
+        errors = np.array([ dist[gram] - count for gram, count
+                            in TG.items() ])
+        # estimates never fall below the true counts, nor far above
+        assert dist.N() == TG.N() and errors.min() >= 0
+        assert errors.max() <= 2 * dist.error_bound()
+        # the most common N-grams are found, with their counts
+        assert [ gram for gram, count in dist.most_common(5) ] \
+            == [ gram for gram, count in TG.most_common(5) ]
+        print("order", n + 1, "N:", TG.N(), dist.N(),
+              "min error:", errors.min(), "max error:", errors.max(),
+              "bound:", dist.error_bound())
+        print(" exact: ", TG.most_common(5))
+        print(" approx:", dist.most_common(5))
@@ -0,0 +1,249 @@
+"""
+Suffix array over the word IDs of a corpus, for N-gram counts of any order.
+
+The corpus is one ID stream, each non-empty sentence followed by the pad
+ID 0, with one more 0 at the start:
+
+    0 <sentence 1> 0 <sentence 2> 0 ... <sentence k> 0
+
+The suffix array lists the stream positions in the sorted order of the
+suffixes starting there, so the occurrences of any N-gram are one
+contiguous run of it, found by binary search: count(ngram) for any
+order, and the continuations of any context, cost O(n log T) for an
+N-gram of n words and a stream of T, with no table per order.
+
+N-grams use the '' padding of ngrams_sent(): leading pads stand for a
+sentence start and trailing pads for its end, so ( '', '', w ) is
+searched as 0 w, and ( w, '', '' ) as w 0.  A pad between words never
+matches.  An N-gram of only pads counts the sentences, empty ones
+included, as context_counts() does for ( '', '' ).
+
+The stream, suffix array, and vocabulary are saved in the model file
+layout and memory mapped when loaded.
+"""
+
+import numpy as np
+
+from nlp_book_ngram_store import PAD, PAD_ID, Vocabulary
+
+# File identifier and version
+MAGIC = b'NGSUFAR1'
+
+# Suffix array of an integer stream, by prefix doubling
+def suffix_array(stream, depth=None):
+    """
+    Return the positions of stream sorted by their suffixes, compared
+    on the first depth IDs only if depth is given (ties kept in
+    position order).  A suffix that ends sorts before its extensions.
+    """
+    stream = np.asarray(stream, dtype=np.int64)
+    n = len(stream)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    order = np.argsort(stream, kind='stable')
+    rank = np.empty(n, dtype=np.int64)
+    sorted_ids = stream[order]
+    rank[order] = np.concatenate(([0], np.cumsum(sorted_ids[1:]
+                                                 != sorted_ids[:-1])))
+    k = 1
+    while rank.max() < n - 1 and (depth is None or k < depth):
+        # rank of the suffix k on, -1 past the end
+        second = np.full(n, -1, dtype=np.int64)
+        second[:n - k] = rank[k:]
+        key = rank * (n + 1) + (second + 1)
+        order = np.argsort(key, kind='stable')
+        sorted_key = key[order]
+        rank[order] = np.concatenate(([0], np.cumsum(sorted_key[1:]
+                                                     != sorted_key[:-1])))
+        k *= 2
+    return order
+
+class SuffixArrayIndex:
+    """
+    N-gram counts and continuations of any order from a suffix array.
+    """
+
+    # The constructor takes a vocabulary, the padded ID stream,
+    # its suffix array, and the number of sentences.
+    def __init__(self, vocab, stream, sa, n_sents):
+        """
+        Wrap the index arrays.
+        """
+        self.vocab = vocab
+        self.stream = stream
+        self.sa = sa
+        self.n_sents = n_sents
+
+    # Build the index for a list of sentences
+    @classmethod
+    def from_sents(cls, sents, vocab=None, depth=None):
+        """
+        Encode the sentences and sort their suffixes.  With depth,
+        suffixes are only sorted on their first depth words, enough
+        for counts of N-grams up to that order and continuations of
+        contexts one shorter.
+        """
+        if vocab is None:
+            vocab = Vocabulary()
+        ids = [ PAD_ID ]
+        n_sents = 0
+        for sent in sents:
+            n_sents += 1
+            if len(sent) == 0:
+                continue
+            ids.extend(vocab.ids(sent).tolist())
+            ids.append(PAD_ID)
+        stream = np.array(ids, dtype=np.int32)
+        return cls(vocab, stream, suffix_array(stream, depth), n_sents)
+
+    # Number of tokens in the stream, pads included
+    def __len__(self):
+        return len(self.stream)
+
+    # Search pattern for an N-gram: its IDs with leading and trailing
+    # pads collapsed to one.  Returns None if it cannot occur.
+    def pattern(self, ngram):
+        if isinstance(ngram, str):
+            ngram = (ngram,)
+        ids = [ self.vocab.lookup(word) for word in ngram ]
+        if -1 in ids:
+            return None
+        first = 0
+        while first < len(ids) and ids[first] == PAD_ID:
+            first += 1
+        last = len(ids)
+        while last > first and ids[last - 1] == PAD_ID:
+            last -= 1
+        words = ids[first:last]
+        if PAD_ID in words:
+            return None
+        return (ids[:first][:1] + words + ids[last:][:1])
+
+    # Suffix at a sorted position, cut to m IDs
+    def prefix(self, i, m):
+        start = int(self.sa[i])
+        return self.stream[start:start + m].tolist()
+
+    # Range of sorted positions whose suffixes start with a pattern
+    def find(self, pattern):
+        """
+        Return ( lo, hi ): the suffixes sa[lo:hi] start with pattern.
+        """
+        m = len(pattern)
+        lo, hi = 0, len(self.sa)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.prefix(mid, m) < pattern:
+                lo = mid + 1
+            else:
+                hi = mid
+        start = lo
+        hi = len(self.sa)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.prefix(mid, m) <= pattern:
+                lo = mid + 1
+            else:
+                hi = mid
+        return start, lo
+
+    # Count of an N-gram of any order
+    def count(self, ngram):
+        """
+        Return the number of times an N-gram, a word or a tuple of
+        words padded with '', occurs in the sentences.
+        """
+        if isinstance(ngram, str):
+            ngram = (ngram,)
+        if len(ngram) > 0 and all([ word == PAD for word in ngram ]):
+            return self.n_sents
+        pattern = self.pattern(ngram)
+        if pattern is None:
+            return 0
+        lo, hi = self.find(pattern)
+        return hi - lo
+
+    def __getitem__(self, ngram):
+        return self.count(ngram)
+
+    # Words following a context, with their counts
+    def continuations(self, context):
+        """
+        Return [ ( word, count ) ] for the words w seen after a context,
+        i.e. the N-grams context + ( w, ), in word ID order.
+        """
+        context = tuple(context)
+        all_pads = all([ word == PAD for word in context ])
+        if len(context) > 0 and context[-1] == PAD and not all_pads:
+            # after a sentence end, only more padding follows
+            count = self.count(context)
+            return [ (PAD, count) ] if count > 0 else []
+        pattern = self.pattern(context)
+        if pattern is None:
+            return []
+        lo, hi = self.find(pattern)
+        following = self.sa[lo:hi].astype(np.int64) + len(pattern)
+        following = following[following < len(self.stream)]
+        ids, counts = np.unique(self.stream[following], return_counts=True)
+        words = self.vocab.words
+        return [ (words[i], c) for i, c in zip(ids.tolist(), counts.tolist()) ]
+
+    # Conditional probabilities of the words following a context
+    def cond_probs(self, context):
+        """
+        Return { word : P(word | context) }, unsmoothed.
+        """
+        counts = self.continuations(context)
+        total = self.count(context)
+        return { word : count / total for word, count in counts }
+
+    # Write the index to a file
+    def save(self, filename):
+        from nlp_book_model_file import vocab_array, write_arrays
+        write_arrays(filename, { 'n_sents' : self.n_sents },
+                     [ ('vocab', vocab_array(self.vocab)),
+                       ('stream', self.stream),
+                       ('sa', self.sa) ], magic=MAGIC)
+
+    # Read an index written by save(), memory mapping its arrays
+    @classmethod
+    def load(cls, filename):
+        from nlp_book_model_file import read_arrays, vocab_from_array
+        header, arrays = read_arrays(filename, magic=MAGIC)
+        return cls(vocab_from_array(arrays['vocab']), arrays['stream'],
+                   arrays['sa'], header['n_sents'])
+
+# ------------------------------------------------------------------------
+# Tests ---
+# ------------------------------------------------------------------------
+
+if __name__ == '__main__':
+
+    import os
+    import tempfile
+    from nlp_book_nltk import count_ngrams_sents, ngrams_sents
+    from nlp_book_bench import zipf_sents
+    from nltk import FreqDist
+
+    sents = [[], ["One"], ["One", "."], ["One", "two", "."],
+             ['This', 'is', 'a', 'short', 'test', '.'],
+             ['This', 'is', 'a', 'test', '.'] ]
+    index = SuffixArrayIndex.from_sents(sents)
+    assert (index.count(('', '', 'One')), index.count(('.', '', '')),
+            index.count(('is', 'a')), index.count(('', ''))) == (3, 4, 2, 6)
+    assert index.continuations(('This', 'is', 'a')) == [ ('short', 1),
+                                                         ('test', 1) ]
+    print(index.continuations(('', '')))
+
+    sents = zipf_sents(20000, vocab_size=500)
+    index = SuffixArrayIndex.from_sents(sents)
+    n_sents, dists = count_ngrams_sents(sents)
+    for n in [ 1, 2, 3, 4 ]:
+        dist = dists[n - 1] if n <= 3 else FreqDist(ngrams_sents(sents, 4))
+        assert all([ index.count(gram) == c for gram, c in dist.items() ]), n
+    filename = os.path.join(tempfile.mkdtemp(), "test.ngsa")
+    index.save(filename)
+    loaded = SuffixArrayIndex.load(filename)
+    assert loaded.continuations(('w1', 'w2')) \
+        == index.continuations(('w1', 'w2'))
+    os.remove(filename)
@@ -0,0 +1,205 @@
+"""
+Trigram sentence generator with a context-prefix index.
+
+Built once per corpus: each bigram context ( w1, w2 ) maps to the
+possible next words and their cummulative probabilities, so choosing
+the next word is a binary search over that context's continuations
+instead of a scan of the whole trigram list.
+"""
+
+import json
+from bisect import bisect_left
+from math import log
+from random import Random
+
+# Starting bigram context for a sentence
+START = ('', '',)
+
+# Sentence end marker
+END = ''
+
+class TrigramGenerator:
+    """
+    Generate random sentences from unsmoothed trigram probabilities.
+    """
+
+    # Build the context index from trigram probabilities
+    # { ( w1, w2, w3 ) : P(w3 | w1, w2) },
+    # e.g. from unsmoothed_trigrams_sents().
+    def __init__(self, utps, seed=None):
+        """
+        Index the trigram probabilities by their bigram context.
+        """
+        self.index = {}
+        for trigram in utps:
+            context = trigram[:2]
+            entry = self.index.get(context)
+            if entry is None:
+                entry = ([], [],)
+                self.index[context] = entry
+            entry[0].append(trigram[2])
+            entry[1].append(utps[trigram])
+        # replace the probabilities by their running totals
+        for context in self.index:
+            next_words, probs = self.index[context]
+            cummulative_probability = 0.0
+            for i in range(len(probs)):
+                cummulative_probability += probs[i]
+                probs[i] = cummulative_probability
+        self.random = Random(seed)
+
+    # Build a generator from a list of sentences
+    @classmethod
+    def from_sents(cls, sents, seed=None):
+        """
+        Compute unsmoothed trigram probabilities and index them.
+        """
+        from nlp_book_nltk import unsmoothed_trigrams_sents
+        return cls(unsmoothed_trigrams_sents(sents), seed=seed)
+
+    # Possible next words and cummulative probabilities for a context
+    def continuations(self, context):
+        """
+        Return ( next words, cummulative probabilities ) for a context,
+        or ( [], [] ) if the context was never seen.
+        """
+        return self.index.get(tuple(context), ([], [],))
+
+    # Choose the next word following a bigram context, and its probability
+    def choose(self, context):
+        """
+        Choose a next word at random, weighted by its probability.
+        Returns ( word, probability ), or ( None, 0.0 ) if the context
+        has no continuations.
+        """
+        next_words, cummulative = self.continuations(context)
+        if len(next_words) == 0:
+            return None, 0.0
+        r = self.random.uniform(0.0, cummulative[-1])
+        i = min(bisect_left(cummulative, r), len(next_words) - 1)
+        prob = cummulative[i] - (cummulative[i-1] if i > 0 else 0.0)
+        return next_words[i], prob
+
+    # Choose the next word following a bigram context
+    def next_word(self, context):
+        """
+        Choose a next word at random, weighted by its probability.
+        Returns None if the context has no continuations.
+        """
+        return self.choose(context)[0]
+
+    # Generate a sentence, with its log probability
+    def generate(self, max_words=200, seed=None, verbose=0):
+        """
+        Choose words from the start context until the end marker,
+        or until max_words words have been chosen.  Reseeds the
+        generator first if a seed is given.  With verbose >= 2,
+        prints each word chosen.  Returns ( words, log probability ).
+        """
+        if seed is not None:
+            self.random.seed(seed)
+        words = []
+        logprob = 0.0
+        context = START
+        while len(words) < max_words:
+            word, prob = self.choose(context)
+            if word is None:
+                break
+            logprob += log(prob)
+            if verbose >= 2:
+                print("Chosen next word: ", word, ", from context:", context,
+                      "prob:", prob)
+            if word == END:
+                break
+            words.append(word)
+            context = (context[1], word,)
+        return words, logprob
+
+    # Generate a sentence as a list of words
+    def sentence_words(self, max_words=200):
+        """
+        Choose words from the start context until the end marker,
+        or until max_words words have been chosen.
+        """
+        return self.generate(max_words)[0]
+
+    # Generate a sentence as a string
+    def sentence(self, max_words=200):
+        """
+        Generate a sentence, words separated by spaces.
+        """
+        return " ".join(self.sentence_words(max_words))
+
+    # Generate a number of sentences
+    def sentences(self, count, max_words=200):
+        """
+        Generate count sentences.
+        """
+        return [ self.sentence(max_words) for i in range(count) ]
+
+# Timestamp line for a sentences file
+def timestamp_line():
+    from datetime import datetime
+    nowStr = datetime.now().strftime("%B %d, %Y %I:%M:%S %p")
+    return "====" + nowStr + "====\n\n"
+
+class SentenceWriter:
+    """
+    Write the generated sentences of a run through buffered files.
+    """
+
+    # The constructor opens the sentences file for appending, with a
+    # timestamp line first, and optionally a JSON lines file for
+    # { "sentence", "seed", "logprob" } records, with an "index" too
+    # for sentences generated from a master seed and their index.
+    def __init__(self, filename, jsonl_filename=None, timestamp=True,
+                 buffering=1 << 20):
+        """
+        Open the output files for the run.
+        """
+        self.outFile = open(filename, "a", buffering=buffering)
+        self.jsonFile = None
+        if jsonl_filename is not None:
+            self.jsonFile = open(jsonl_filename, "a", buffering=buffering)
+        if timestamp:
+            self.outFile.write(timestamp_line())
+
+    # Write one sentence
+    def write(self, sentence, seed=None, logprob=None, index=None):
+        """
+        Append a sentence, and its JSON record if wanted.
+        """
+        self.outFile.write(sentence + "\n\n")
+        if self.jsonFile is not None:
+            record = { 'sentence' : sentence.strip(), 'seed' : seed,
+                       'logprob' : logprob }
+            if index is not None:
+                record['index'] = index
+            self.jsonFile.write(json.dumps(record) + "\n")
+
+    # Flush and close the files
+    def close(self):
+        self.outFile.close()
+        if self.jsonFile is not None:
+            self.jsonFile.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+# ------------------------------------------------------------------------
+# Tests ---
+# ------------------------------------------------------------------------
+
+if __name__ == '__main__':
+
+    sents = [["One"], ["One", "."], ["One", "two", "."],
+             ['This', 'is', 'a', 'short', 'test', '.'] ]
+    generator = TrigramGenerator.from_sents(sents, seed=1)
+    assert generator.continuations(START) == (['One', 'This'], [0.75, 1.0])
+    for sentence in generator.sentences(5):
+        # this corpus can only give back its own sentences
+        assert sentence.split() in sents, sentence
+        print(sentence)
@@ -1,26 +1,54 @@
-from nltk import *
-from nlp_book_nltk import bi_grams_sents
-from nlp_book_nltk import tri_grams_sents
-from nlp_book_nltk import unsmoothed_unigrams_sents
-from nlp_book_nltk import unsmoothed_bigrams_sents
-from nlp_book_nltk import unsmoothed_trigrams_sents
+# nltk_init_emma: Emma counts and unsmoothed probabilities, on first use.
+#
+# Importing this module is cheap: the names below are computed the first
+# time one of them is accessed, e.g. by
+#   from nltk_init_emma import *
+# or nltk_init_emma.TG_dist.
+#
+# The counts come from the Emma model file (gutenberg_model(), built
+# on first use and memory mapped after that), so later runs load them
+# instead of recounting; the FreqDists and probability dictionaries
+# are made from its tables.  The sentences are kept in the stage cache
+# (nlp_book_cache), keyed by the content of the Emma file.
+
 filename = 'austen-emma.txt'
-print("---- from ", filename, " ----")
-from nltk.corpus import gutenberg
-words = gutenberg.words(filename)
-sents = gutenberg.sents(filename)
-UG_dist = FreqDist(words)
-UG_dist.most_common(n=50)
-bigrams = bi_grams_sents(sents)
-BG_dist = FreqDist(bigrams)
-BG_dist_counts = [ BG_dist[gram] for gram in BG_dist ]
-BG_counts_dist = FreqDist(BG_dist_counts)
-BG_dist.most_common(n=50)
-trigrams = tri_grams_sents(sents)
-TG_dist = FreqDist(trigrams)
-TG_dist_counts = [ TG_dist[gram] for gram in TG_dist ]
-TG_counts_dist = FreqDist(TG_dist_counts)
-TG_dist.most_common(n=50)
-uups = unsmoothed_unigrams_sents(sents)
-ubps = unsmoothed_bigrams_sents(sents)
-utps = unsmoothed_trigrams_sents(sents)
+
+__all__ = [ 'filename', 'corpus_digest', 'model', 'words', 'sents', 'n_sents',
+            'UG_dist', 'BG_dist', 'TG_dist',
+            'BG_dist_counts', 'BG_counts_dist',
+            'TG_dist_counts', 'TG_counts_dist',
+            'uups', 'ubps', 'utps' ]
+
+def _init_emma():
+    import nltk
+    from nltk import FreqDist
+    from nltk.corpus import gutenberg
+    from nlp_book_cache import get_cache, file_digest
+    from nlp_book_model_file import gutenberg_model
+    print("---- from ", filename, " ----")
+    cache = get_cache()
+    corpus_digest = file_digest(gutenberg.abspath(filename))
+    words = gutenberg.words(filename)
+    sents = cache.get_or_compute(
+        corpus_digest, 'gutenberg.sents', None,
+        lambda: [ list(sent) for sent in gutenberg.sents(filename) ],
+        code="nltk " + nltk.__version__)
+    model = gutenberg_model(filename, max_order=3)
+    n_sents = model.store.n_sents
+    UG_dist, BG_dist, TG_dist = [ model.store.freq_dist(n)
+                                  for n in [ 1, 2, 3 ] ]
+    BG_dist_counts = list(BG_dist.values())
+    BG_counts_dist = FreqDist(BG_dist_counts)
+    TG_dist_counts = list(TG_dist.values())
+    TG_counts_dist = FreqDist(TG_dist_counts)
+    uups = model.store.unsmoothed_unigrams()
+    ubps = model.store.unsmoothed_bigrams()
+    utps = model.store.unsmoothed_trigrams()
+    del cache, nltk
+    globals().update(locals())
+
+def __getattr__(name):
+    if name in __all__:
+        _init_emma()
+        return globals()[name]
+    raise AttributeError("module 'nltk_init_emma' has no attribute " + name)